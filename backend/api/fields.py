@@ -0,0 +1,88 @@
+import base64
+import binascii
+import uuid
+
+import filetype
+from django.core.files.uploadedfile import TemporaryUploadedFile
+from drf_extra_fields.fields import Base64ImageField
+from foodgram_project.settings import (IMAGE_UPLOAD_MAX_PIXELS,
+                                       IMAGE_UPLOAD_MAX_SIZE)
+from PIL import Image
+from rest_framework.exceptions import ValidationError
+from rest_framework.fields import ImageField
+
+BASE64_MARKER = ';base64,'
+HEADER_MAX_LENGTH = 100
+CHUNK_LENGTH = 64 * 1024
+IMAGE_TOO_LARGE = 'Размер изображения не должен превышать {} байт'
+TOO_MANY_PIXELS = 'Изображение не должно быть больше {} пикселей'
+
+
+class StreamingBase64ImageField(Base64ImageField):
+
+    def to_internal_value(self, base64_data):
+        if base64_data in self.EMPTY_VALUES or not isinstance(
+                base64_data, str):
+            return super().to_internal_value(base64_data)
+        start = base64_data.find(BASE64_MARKER, 0, HEADER_MAX_LENGTH)
+        start = 0 if start == -1 else start + len(BASE64_MARKER)
+        if (len(base64_data) - start) * 3 // 4 > IMAGE_UPLOAD_MAX_SIZE:
+            raise ValidationError(
+                IMAGE_TOO_LARGE.format(IMAGE_UPLOAD_MAX_SIZE))
+        file = self.decode(base64_data, start)
+        try:
+            return self.validate_file(file)
+        except Exception:
+            file.close()
+            raise
+
+    def validate_file(self, file):
+        try:
+            with Image.open(file) as image:
+                pixels = image.width * image.height
+        except (OSError, Image.DecompressionBombError):
+            raise ValidationError(self.INVALID_FILE_MESSAGE)
+        if pixels > IMAGE_UPLOAD_MAX_PIXELS:
+            raise ValidationError(
+                TOO_MANY_PIXELS.format(IMAGE_UPLOAD_MAX_PIXELS))
+        file.seek(0)
+        return ImageField.to_internal_value(self, file)
+
+    def decode_chunk(self, chunk):
+        try:
+            return base64.b64decode(chunk, validate=True)
+        except binascii.Error:
+            raise ValidationError(self.INVALID_FILE_MESSAGE)
+
+    def decode_chunks(self, base64_data, start):
+        # Whitespace and line breaks are allowed like in Base64ImageField,
+        # chunks are decoded in whole 4-character groups.
+        rest = ''
+        for position in range(start, len(base64_data), CHUNK_LENGTH):
+            chunk = rest + ''.join(
+                base64_data[position:position + CHUNK_LENGTH].split())
+            end = len(chunk) - len(chunk) % 4
+            rest = chunk[end:]
+            if end:
+                yield self.decode_chunk(chunk[:end])
+        if rest:
+            yield self.decode_chunk(rest)
+
+    def decode(self, base64_data, start):
+        chunks = self.decode_chunks(base64_data, start)
+        head = next(chunks, b'')
+        extension = filetype.guess_extension(head)
+        if extension not in self.ALLOWED_TYPES:
+            raise ValidationError(self.INVALID_TYPE_MESSAGE)
+        file = TemporaryUploadedFile(
+            f'{uuid.uuid4()}.{extension}', filetype.guess_mime(head), 0, None)
+        try:
+            file.write(head)
+            for chunk in chunks:
+                file.write(chunk)
+        except Exception:
+            file.close()
+            raise
+        file.size = file.tell()
+        file.seek(0)
+        return file
@@ -1,20 +1,39 @@
 from django_filters.rest_framework import FilterSet, filters
+from foodgram_project.settings import INGREDIENT_SEARCH_LIMIT
 from recipes.models import Recipe, Tag
+from recipes.search import get_ingredient_search
 
 
 class IngredientFilter(FilterSet):
-    name = filters.CharFilter(lookup_expr='startswith')
+    name = filters.CharFilter(method='filter_name')
+
+    def filter_name(self, queryset, name, value):
+        return get_ingredient_search().search(
+            queryset, value, INGREDIENT_SEARCH_LIMIT)
+
+
+ORDERINGS = {
+    'popular': ('-favorites_count', '-pub_date', '-id'),
+}
 
 
 class RecipeFilter(FilterSet):
     tags = filters.ModelMultipleChoiceFilter(
         queryset=Tag.objects.all(),
-        field_name='tags__slug',
-        to_field_name='slug')
+        to_field_name='slug',
+        method='filter_tags')
     is_favorited = filters.BooleanFilter(
         method='filter_is_favorited')
     is_in_shopping_cart = filters.BooleanFilter(
         method='filter_is_in_shopping_cart')
+    ordering = filters.ChoiceFilter(
+        choices=tuple((ordering, ordering) for ordering in ORDERINGS),
+        method='filter_ordering')
+
+    def filter_tags(self, queryset, name, value):
+        if not value:
+            return queryset
+        return queryset.with_any_tag(value)
 
     def filter_is_favorited(self, queryset, name, value):
         user = self.request.user
@@ -28,6 +47,9 @@ class RecipeFilter(FilterSet):
             return queryset.filter(shoppingcarts__user=user)
         return queryset
 
+    def filter_ordering(self, queryset, name, value):
+        return queryset.order_by(*ORDERINGS[value])
+
     class Meta:
         model = Recipe
         fields = ('tags', 'author', 'is_favorited', 'is_in_shopping_cart',)
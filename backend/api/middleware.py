@@ -0,0 +1,148 @@
+import logging
+import threading
+import time
+from bisect import bisect_left
+from collections import defaultdict
+
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connection
+from foodgram_project.settings import (PROFILING, QUERY_BUDGET_STRICT,
+                                       QUERY_BUDGETS)
+
+SERVER_TIMING = (
+    'db;dur={db:.1f};desc="{queries} queries", '
+    'app;dur={app:.1f};desc="serializers, rendering", '
+    'total;dur={total:.1f}')
+BUDGET_EXCEEDED = '{endpoint}: {queries} запросов к базе при бюджете {budget}'
+
+HISTOGRAM_BUCKETS = {
+    'queries': (1, 2, 3, 5, 10, 20, 50, 100),
+    'db': (1, 5, 10, 25, 50, 100, 250, 500, 1000),
+    'app': (1, 5, 10, 25, 50, 100, 250, 500, 1000),
+    'total': (5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000),
+    'bytes': (1024, 10 * 1024, 100 * 1024, 1024 * 1024, 10 * 1024 * 1024),
+}
+
+logger = logging.getLogger(__name__)
+
+endpoint_stats = defaultdict(lambda: {
+    'count': 0,
+    **{metric: {'sum': 0, 'max': 0, 'buckets': [0] * (len(buckets) + 1)}
+       for metric, buckets in HISTOGRAM_BUCKETS.items()}})
+endpoint_stats_lock = threading.Lock()
+
+
+class QueryBudgetExceeded(AssertionError):
+    pass
+
+
+class QueryRecorder:
+
+    def __init__(self):
+        self.queries = 0
+        self.duration = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.duration += time.perf_counter() - started
+            self.queries += 1
+
+
+def get_endpoint(request):
+    match = request.resolver_match
+    if match is None:
+        return None
+    view = match.func
+    action = getattr(view, 'actions', {}).get(request.method.lower())
+    basename = getattr(view, 'initkwargs', {}).get('basename')
+    if action and basename:
+        return f'{basename}-{action}'
+    return match.url_name or match.view_name
+
+
+def record(endpoint, metrics):
+    with endpoint_stats_lock:
+        stats = endpoint_stats[endpoint]
+        stats['count'] += 1
+        for metric, value in metrics.items():
+            histogram = stats[metric]
+            histogram['sum'] += value
+            histogram['max'] = max(histogram['max'], value)
+            histogram['buckets'][
+                bisect_left(HISTOGRAM_BUCKETS[metric], value)] += 1
+
+
+def get_stats():
+    with endpoint_stats_lock:
+        return {
+            endpoint: {
+                'count': stats['count'],
+                **{metric: {
+                    'mean': stats[metric]['sum'] / stats['count'],
+                    'max': stats[metric]['max'],
+                    'histogram': dict(zip(
+                        (*map(str, buckets), '+Inf'),
+                        stats[metric]['buckets']))}
+                   for metric, buckets in HISTOGRAM_BUCKETS.items()}}
+            for endpoint, stats in sorted(endpoint_stats.items())}
+
+
+def get_metrics(recorder, started):
+    total = (time.perf_counter() - started) * 1000
+    return {
+        'queries': recorder.queries,
+        'db': recorder.duration * 1000,
+        'app': total - recorder.duration * 1000,
+        'total': total}
+
+
+class ProfilingMiddleware:
+
+    def __init__(self, get_response):
+        if not PROFILING:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+
+    def __call__(self, request):
+        recorder = QueryRecorder()
+        started = time.perf_counter()
+        with connection.execute_wrapper(recorder):
+            response = self.get_response(request)
+        endpoint = get_endpoint(request)
+        if endpoint is None:
+            return response
+        metrics = get_metrics(recorder, started)
+        response['Server-Timing'] = SERVER_TIMING.format(**metrics)
+        if response.streaming:
+            response.streaming_content = self.profile_streaming(
+                response.streaming_content, endpoint, recorder, started)
+            return response
+        self.check_budget(endpoint, recorder.queries)
+        record(endpoint, {**metrics, 'bytes': len(response.content)})
+        return response
+
+    def profile_streaming(self, content, endpoint, recorder, started):
+        # Streaming responses may query the database while they are sent,
+        # e.g. the shopping list cursor, so these queries count too.
+        size = 0
+        try:
+            with connection.execute_wrapper(recorder):
+                for chunk in content:
+                    size += len(chunk)
+                    yield chunk
+            self.check_budget(endpoint, recorder.queries)
+        finally:
+            record(endpoint, {**get_metrics(recorder, started), 'bytes': size})
+
+    def check_budget(self, endpoint, queries):
+        budget = QUERY_BUDGETS.get(endpoint)
+        if budget is None or queries <= budget:
+            return
+        message = BUDGET_EXCEEDED.format(
+            endpoint=endpoint, queries=queries, budget=budget)
+        if QUERY_BUDGET_STRICT:
+            raise QueryBudgetExceeded(message)
+        logger.warning(message)
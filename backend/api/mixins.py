@@ -0,0 +1,120 @@
+import json
+import threading
+import time
+from collections import Counter
+from hashlib import sha256
+
+from django.http import HttpResponse
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date, quote_etag, urlencode
+from foodgram_project.settings import (POPULAR_CACHE_TIMEOUT,
+                                       REFERENCE_CACHE_SIZE)
+from recipes.cache import LocMemDocumentCache, get_response_cache
+from recipes.models import Recipe, ReferenceVersion
+from rest_framework.renderers import JSONRenderer
+from rest_framework.response import Response
+
+CACHE_HEADER = 'X-Cache'
+POPULAR_ORDERING = 'popular'
+
+reference_cache = LocMemDocumentCache(max_entries=REFERENCE_CACHE_SIZE)
+response_cache_stats = Counter()
+response_cache_stats_lock = threading.Lock()
+
+
+def count_response_cache(result):
+    with response_cache_stats_lock:
+        response_cache_stats[result] += 1
+
+
+def get_response_cache_key(request):
+    query = sorted(
+        (name, value)
+        for name, values in request.query_params.lists()
+        for value in values)
+    return sha256(
+        f'{request.build_absolute_uri(request.path)}?{urlencode(query)}'
+        .encode()).hexdigest()
+
+
+class ReferenceCacheMixin:
+
+    def get_cached_response(self, request, get_data):
+        reference = ReferenceVersion.get_for_model(self.queryset.model)
+        version = f'{reference.name}-{reference.version}'
+        headers = {
+            'ETag': quote_etag(version),
+            'Last-Modified': http_date(reference.updated.timestamp())}
+        not_modified = get_conditional_response(
+            request,
+            etag=headers['ETag'],
+            last_modified=int(reference.updated.timestamp()))
+        if not_modified is not None:
+            for header, value in headers.items():
+                not_modified[header] = value
+            return not_modified
+        data = reference_cache.get(request.get_full_path(), version)
+        if data is None:
+            data = get_data()
+            data = list(data) if isinstance(data, list) else dict(data)
+            reference_cache.set(request.get_full_path(), version, data)
+        return Response(data, headers=headers)
+
+    def list(self, request, *args, **kwargs):
+        return self.get_cached_response(
+            request, lambda: super(ReferenceCacheMixin, self).list(
+                request, *args, **kwargs).data)
+
+    def retrieve(self, request, *args, **kwargs):
+        return self.get_cached_response(
+            request, lambda: super(ReferenceCacheMixin, self).retrieve(
+                request, *args, **kwargs).data)
+
+
+class RecipeCacheMixin:
+
+    def get_anonymous_response(self, request, version, get_response):
+        if not request.user.is_anonymous or version is None:
+            return get_response()
+        response_cache = get_response_cache()
+        key = get_response_cache_key(request)
+        content = response_cache.get(key, version)
+        if content is not None:
+            count_response_cache('hits')
+            if request.accepted_renderer.format == 'json':
+                response = HttpResponse(
+                    content, content_type=request.accepted_media_type)
+            else:
+                response = Response(json.loads(content))
+            response[CACHE_HEADER] = 'HIT'
+            return response
+        count_response_cache('misses')
+        response = get_response()
+        if response.status_code == 200:
+            response_cache.set(
+                key, version, JSONRenderer().render(response.data))
+        response[CACHE_HEADER] = 'MISS'
+        return response
+
+    def list(self, request, *args, **kwargs):
+        version = str(ReferenceVersion.get_for_model(Recipe).version)
+        if request.query_params.get('ordering') == POPULAR_ORDERING:
+            # Favorite counts change on every click, the popular feed is
+            # rebuilt once per time bucket instead.
+            version += f'-{int(time.time() // POPULAR_CACHE_TIMEOUT)}'
+        return self.get_anonymous_response(
+            request, version, lambda: super(RecipeCacheMixin, self).list(
+                request, *args, **kwargs))
+
+    def retrieve(self, request, *args, **kwargs):
+        try:
+            updated = Recipe.objects.filter(
+                pk=kwargs[self.lookup_field]
+            ).values_list('updated', flat=True).first()
+        except (ValueError, TypeError):
+            updated = None
+        return self.get_anonymous_response(
+            request,
+            updated.isoformat() if updated else None,
+            lambda: super(RecipeCacheMixin, self).retrieve(
+                request, *args, **kwargs))
@@ -1,6 +1,90 @@
+from base64 import b64decode, b64encode
+from binascii import Error as DecodeError
+from collections import OrderedDict
+from datetime import datetime
+
+from django.db.models import Q
+from rest_framework.exceptions import NotFound, ValidationError
 from rest_framework.pagination import PageNumberPagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
+
+INVALID_CURSOR = 'Неверный курсор'
+CURSOR_ORDERING = (
+    'Курсор поддерживает только сортировку по дате публикации')
 
 
 class CustomPagination(PageNumberPagination):
     page_size = 6
     page_size_query_param = 'limit'
+
+
+class RecipePagination(CustomPagination):
+    cursor_query_param = 'cursor'
+    count_query_param = 'count'
+    approximate_count = 'approximate'
+    approximate_count_limit = 1000
+    cursor_max_page_size = 100
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.cursor_mode = self.cursor_query_param in request.query_params
+        if not self.cursor_mode:
+            return super().paginate_queryset(queryset, request, view)
+        if queryset.query.order_by:
+            # The keyset is (pub_date, pk), other orderings would skip or
+            # repeat rows between pages.
+            raise ValidationError({self.cursor_query_param: CURSOR_ORDERING})
+        self.request = request
+        self.count = None
+        if (request.query_params.get(self.count_query_param)
+                == self.approximate_count):
+            self.count = queryset[:self.approximate_count_limit].count()
+        page_size = min(
+            self.get_page_size(request) or self.page_size,
+            self.cursor_max_page_size)
+        cursor = request.query_params[self.cursor_query_param]
+        if cursor:
+            pub_date, pk = self.decode_cursor(cursor)
+            queryset = queryset.filter(
+                Q(pub_date__lt=pub_date) | Q(pub_date=pub_date, pk__lt=pk))
+        page = list(queryset.order_by('-pub_date', '-pk')[:page_size + 1])
+        self.next_cursor = None
+        if len(page) > page_size:
+            page = page[:page_size]
+            self.next_cursor = self.encode_cursor(page[-1])
+        return page
+
+    def encode_cursor(self, recipe):
+        return b64encode(
+            f'{recipe.pub_date.isoformat()}|{recipe.pk}'.encode(),
+            altchars=b'-_').decode()
+
+    def decode_cursor(self, cursor):
+        try:
+            pub_date, pk = b64decode(
+                cursor.encode(), altchars=b'-_', validate=True
+            ).decode().split('|')
+            return datetime.fromisoformat(pub_date), int(pk)
+        except (DecodeError, UnicodeDecodeError, ValueError):
+            raise NotFound(INVALID_CURSOR)
+
+    def get_next_link(self):
+        if not self.cursor_mode:
+            return super().get_next_link()
+        if self.next_cursor is None:
+            return None
+        return replace_query_param(
+            self.request.build_absolute_uri(),
+            self.cursor_query_param,
+            self.next_cursor)
+
+    def get_paginated_response(self, data):
+        if not self.cursor_mode:
+            return super().get_paginated_response(data)
+        response = OrderedDict((('next', self.get_next_link()),))
+        if self.count is not None:
+            response['count'] = self.count
+            response['count_is_approximate'] = (
+                self.count >= self.approximate_count_limit)
+        response['results'] = data
+        return Response(response)
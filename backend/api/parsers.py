@@ -0,0 +1,24 @@
+from foodgram_project.settings import RECIPE_REQUEST_MAX_SIZE
+from rest_framework import status
+from rest_framework.exceptions import APIException
+from rest_framework.parsers import JSONParser
+
+REQUEST_TOO_LARGE = 'Размер запроса не должен превышать {} байт'
+
+
+class RequestTooLarge(APIException):
+    status_code = status.HTTP_413_REQUEST_ENTITY_TOO_LARGE
+
+
+class RecipeJSONParser(JSONParser):
+    max_size = RECIPE_REQUEST_MAX_SIZE
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        request = parser_context['request']
+        try:
+            size = int(request.META.get('CONTENT_LENGTH') or 0)
+        except ValueError:
+            size = 0
+        if size > self.max_size:
+            raise RequestTooLarge(REQUEST_TOO_LARGE.format(self.max_size))
+        return super().parse(stream, media_type, parser_context)
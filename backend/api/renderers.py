@@ -0,0 +1,24 @@
+from foodgram_project.settings import FILEFORMAT
+from recipes.utils import RENDERERS
+from rest_framework.renderers import BaseRenderer, JSONRenderer
+
+
+class ShoppingListRenderer(BaseRenderer):
+    charset = None
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+        renderer_context['response']['Content-Type'] = (
+            JSONRenderer.media_type)
+        return JSONRenderer().render(data)
+
+
+SHOPPING_LIST_RENDERERS = tuple(sorted(
+    (type(
+        f'{document_renderer.format.title()}ShoppingListRenderer',
+        (ShoppingListRenderer,),
+        {'format': document_renderer.format,
+         'media_type': document_renderer.media_type})
+     for document_renderer in RENDERERS.values()),
+    key=lambda renderer: renderer.media_type != FILEFORMAT))
@@ -1,13 +1,19 @@
 from collections import Counter
 
-from django.shortcuts import get_object_or_404
+from django.db import models, transaction
+from django.db.models import prefetch_related_objects
+from foodgram_project.settings import IMAGE_RENDITIONS, RECIPES_LIMIT_MAX
 from djoser.serializers import UserCreateSerializer, UserSerializer
-from drf_extra_fields.fields import Base64ImageField
-from recipes.models import FoodUser, Ingredient, Recipe, RecipeIngredient, Tag
+from recipes.cache import get_fragment_cache
+from recipes.images import schedule_renditions
+from recipes.models import (FoodUser, Ingredient, Recipe, RecipeIngredient,
+                            ShoppingListItem, Tag)
 from rest_framework import serializers
 from rest_framework.exceptions import ValidationError
 from rest_framework.validators import UniqueValidator
 
+from .fields import StreamingBase64ImageField
+
 NO_INGREDIENTS = 'Добавьте ингридиенты'
 NO_INGREDIENTS_DB = 'Этого ингредиента нет в базе'
 
@@ -23,6 +29,25 @@ RECIPE_NO_TAGS = 'Нужен хотя бы один тег'
 NOT_INT = 'Введите число >= 0, вы ввели: {}'
 
 
+def get_recipes_limit(request):
+    limit = request.GET.get('recipes_limit', RECIPES_LIMIT_MAX)
+    try:
+        limit = int(limit)
+    except ValueError:
+        raise ValidationError(NOT_INT.format(limit))
+    if limit < 0:
+        raise ValidationError(NOT_INT.format(limit))
+    return min(limit, RECIPES_LIMIT_MAX)
+
+
+def cache_related(instance, related_name, objects):
+    queryset = getattr(instance, related_name).all()
+    queryset._result_cache = list(objects)
+    queryset._prefetch_done = True
+    instance.__dict__.setdefault(
+        '_prefetched_objects_cache', {})[related_name] = queryset
+
+
 def check_is_anonymous(func):
     def wrapper(self, obj):
         user = self.context.get('request').user
@@ -47,6 +72,8 @@ class FoodUserSerializer(UserSerializer):
 
     @check_is_anonymous
     def get_is_subscribed(self, user):
+        if hasattr(user, 'is_subscribed'):
+            return user.is_subscribed
         return user.following.filter(
             user=self.context.get('request').user
         ).exists()
@@ -86,17 +113,61 @@ class RecipeIngredientSerializer(serializers.ModelSerializer):
         fields = ('id', 'name', 'measurement_unit', 'amount',)
 
 
-class RecipeSerializer(serializers.ModelSerializer):
+class AuthorSerializer(serializers.ModelSerializer):
+
+    class Meta:
+        model = FoodUser
+        fields = (
+            'email',
+            'id',
+            'username',
+            'first_name',
+            'last_name',)
+
+
+class RecipeFragmentSerializer(serializers.ModelSerializer):
     tags = TagSerializer(many=True)
-    author = UserSerializer(read_only=True)
+    author = AuthorSerializer(read_only=True)
     ingredients = RecipeIngredientSerializer(
         many=True, source='recipe_ingredient')
-    is_favorited = serializers.SerializerMethodField(read_only=True)
-    is_in_shopping_cart = serializers.SerializerMethodField(read_only=True)
     image = serializers.SerializerMethodField()
+    image_renditions = serializers.SerializerMethodField()
 
     class Meta:
         model = Recipe
+        fields = (
+            'id',
+            'tags',
+            'author',
+            'ingredients',
+            'name',
+            'image',
+            'image_renditions',
+            'text',
+            'cooking_time',)
+
+    def get_image(self, recipe):
+        return recipe.get_image_url('full')
+
+    def get_image_renditions(self, recipe):
+        return {
+            rendition: recipe.get_image_url(rendition)
+            for rendition in IMAGE_RENDITIONS}
+
+
+class RecipeListSerializer(serializers.ListSerializer):
+
+    def to_representation(self, data):
+        recipes = data.all() if isinstance(data, models.Manager) else data
+        return self.child.to_representation_many(list(recipes))
+
+
+class RecipeSerializer(RecipeFragmentSerializer):
+    author = FoodUserSerializer(read_only=True)
+    is_favorited = serializers.SerializerMethodField(read_only=True)
+    is_in_shopping_cart = serializers.SerializerMethodField(read_only=True)
+
+    class Meta(RecipeFragmentSerializer.Meta):
         fields = (
             'id',
             'tags',
@@ -106,22 +177,70 @@ class RecipeSerializer(serializers.ModelSerializer):
             'is_in_shopping_cart',
             'name',
             'image',
+            'image_renditions',
             'text',
             'cooking_time',)
+        list_serializer_class = RecipeListSerializer
 
     @check_is_anonymous
     def get_is_favorited(self, recipe):
+        if hasattr(recipe, 'is_favorited'):
+            return recipe.is_favorited
         return self.context.get(
             'request').user.favorites.filter(recipe=recipe).exists()
 
     @check_is_anonymous
     def get_is_in_shopping_cart(self, recipe):
+        if hasattr(recipe, 'is_in_shopping_cart'):
+            return recipe.is_in_shopping_cart
         return self.context.get(
             'request').user.shoppingcarts.filter(recipe=recipe).exists()
 
-    def get_image(self, recipe):
-        if recipe.image:
-            return recipe.image.url
+    @check_is_anonymous
+    def get_author_is_subscribed(self, recipe):
+        if hasattr(recipe, 'author_is_subscribed'):
+            return recipe.author_is_subscribed
+        return recipe.author.following.filter(
+            user=self.context.get('request').user
+        ).exists()
+
+    def get_fragments(self, recipes):
+        fragment_cache = get_fragment_cache()
+        fragments, missing = {}, []
+        for recipe in recipes:
+            fragment = fragment_cache.get(
+                recipe.id, recipe.updated.isoformat())
+            if fragment is None:
+                missing.append(recipe)
+            else:
+                fragments[recipe.id] = fragment
+        prefetch_related_objects(
+            missing, 'tags', 'recipe_ingredient__ingredient', 'author')
+        for recipe in missing:
+            fragment = dict(RecipeFragmentSerializer(recipe).data)
+            fragment_cache.set(
+                recipe.id, recipe.updated.isoformat(), fragment)
+            fragments[recipe.id] = fragment
+        return fragments
+
+    def to_representation_many(self, recipes):
+        fragments = self.get_fragments(recipes)
+        return [
+            self.merge_user_fields(fragments[recipe.id], recipe)
+            for recipe in recipes]
+
+    def merge_user_fields(self, fragment, recipe):
+        data = {
+            **fragment,
+            'author': {
+                **fragment['author'],
+                'is_subscribed': self.get_author_is_subscribed(recipe)},
+            'is_favorited': self.get_is_favorited(recipe),
+            'is_in_shopping_cart': self.get_is_in_shopping_cart(recipe)}
+        return {field: data[field] for field in self.Meta.fields}
+
+    def to_representation(self, recipe):
+        return self.to_representation_many([recipe])[0]
 
 
 class AddIngredientSerializer(serializers.ModelSerializer):
@@ -135,7 +254,7 @@ class AddIngredientSerializer(serializers.ModelSerializer):
 
 class RecipeCreateSerializer(serializers.ModelSerializer):
     ingredients = AddIngredientSerializer(many=True,)
-    image = Base64ImageField()
+    image = StreamingBase64ImageField()
 
     class Meta:
         model = Recipe
@@ -148,6 +267,10 @@ class RecipeCreateSerializer(serializers.ModelSerializer):
             'text',
             'cooking_time',)
 
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.related_objects = {}
+
     def check_unique(self, obj_list):
         if len(obj_list) != len(set(obj_list)):
             not_unique = [
@@ -159,9 +282,15 @@ class RecipeCreateSerializer(serializers.ModelSerializer):
     def validate_ingredients(self, ingredients):
         if not ingredients:
             raise ValidationError(NO_INGREDIENTS)
+        found = Ingredient.objects.in_bulk(
+            ingredient['id'] for ingredient in ingredients)
+        if len(found) != len(set(
+                ingredient['id'] for ingredient in ingredients)):
+            raise ValidationError(NO_INGREDIENTS_DB)
         self.check_unique([
-            get_object_or_404(Ingredient, id=ingredient['id'])
-            for ingredient in ingredients])
+            found[ingredient['id']] for ingredient in ingredients])
+        for ingredient in ingredients:
+            ingredient['ingredient'] = found[ingredient['id']]
         return ingredients
 
     def validate_tags(self, tags):
@@ -175,24 +304,48 @@ class RecipeCreateSerializer(serializers.ModelSerializer):
             raise ValidationError(NO_IMAGE)
         return image
 
-    def set_ingredients(self, recipe, ingredients, clear_ingredients=False):
-        if clear_ingredients:
-            recipe.ingredients.clear()
-        RecipeIngredient.objects.bulk_create(
-            RecipeIngredient(
-                recipe=recipe,
-                ingredient_id=data['id'],
-                amount=data['amount'])
-            for data in ingredients)
-
+    def set_ingredients(self, recipe, ingredients, current_items=(),
+                        is_update=False):
+        current_items = {item.ingredient_id: item for item in current_items}
+        amounts = Counter()
+        new_items, changed_items, recipe_ingredients = [], [], []
+        for data in ingredients:
+            item = current_items.pop(data['id'], None)
+            if item is None:
+                item = RecipeIngredient(recipe=recipe, amount=data['amount'])
+                new_items.append(item)
+                amounts[data['id']] += data['amount']
+            elif item.amount != data['amount']:
+                amounts[data['id']] += data['amount'] - item.amount
+                item.amount = data['amount']
+                changed_items.append(item)
+            item.ingredient = data['ingredient']
+            recipe_ingredients.append(item)
+        if current_items:
+            # Shopping lists drop deleted rows in the post_delete receiver.
+            RecipeIngredient.objects.filter(
+                id__in=[item.id for item in current_items.values()]
+            ).delete()
+        RecipeIngredient.objects.bulk_create(new_items)
+        RecipeIngredient.objects.bulk_update(changed_items, ('amount',))
+        if is_update:
+            ShoppingListItem.change_recipe(recipe.pk, amounts)
+        self.related_objects['recipe_ingredient'] = recipe_ingredients
+
+    @transaction.atomic
     def create(self, validated_data):
         ingredients = validated_data.pop('ingredients')
         tags = validated_data.pop('tags')
         recipe = super().create(validated_data)
+        schedule_renditions(recipe)
         self.set_ingredients(recipe, ingredients)
         recipe.tags.set(tags)
+        self.related_objects['tags'] = sorted(tags, key=lambda tag: tag.id)
+        recipe.is_favorited = recipe.is_in_shopping_cart = False
+        recipe.author_is_subscribed = False
         return recipe
 
+    @transaction.atomic
     def update(self, recipe, validated_data):
         if not validated_data.get('ingredients'):
             raise ValidationError(RECIPE_NO_INGREDIENTS)
@@ -200,14 +353,28 @@ class RecipeCreateSerializer(serializers.ModelSerializer):
         if not validated_data.get('tags'):
             raise ValidationError(RECIPE_NO_TAGS)
         tags = validated_data.pop('tags')
+        current_items = list(recipe.recipe_ingredient.all())
+        if 'image' in validated_data:
+            validated_data['image_renditions'] = {}
         recipe = super().update(recipe, validated_data)
-        recipe.tags.clear()
+        if 'image' in validated_data:
+            schedule_renditions(recipe)
         recipe.tags.set(tags)
-        self.set_ingredients(recipe, ingredients, clear_ingredients=True)
-        recipe.save()
+        self.related_objects['tags'] = sorted(tags, key=lambda tag: tag.id)
+        self.set_ingredients(
+            recipe, ingredients, current_items, is_update=True)
         return recipe
 
+    def save(self, **kwargs):
+        try:
+            return super().save(**kwargs)
+        finally:
+            if self.validated_data.get('image'):
+                self.validated_data['image'].close()
+
     def to_representation(self, recipe):
+        for related_name, objects in self.related_objects.items():
+            cache_related(recipe, related_name, objects)
         return RecipeSerializer(
             recipe,
             context={'request': self.context.get('request')}
@@ -215,12 +382,19 @@ class RecipeCreateSerializer(serializers.ModelSerializer):
 
 
 class RecipeCutFieldsSerializer(serializers.ModelSerializer):
-    image = Base64ImageField()
+    image = serializers.SerializerMethodField()
 
     class Meta:
         model = Recipe
         fields = ('id', 'name', 'image', 'cooking_time',)
 
+    def get_image(self, recipe):
+        url = recipe.get_image_url('card')
+        request = self.context.get('request')
+        if url and request:
+            return request.build_absolute_uri(url)
+        return url
+
 
 class SubscriptionSerializer(FoodUserSerializer):
     recipes = serializers.SerializerMethodField()
@@ -237,16 +411,16 @@ class SubscriptionSerializer(FoodUserSerializer):
             'last_name': {'required': False}}
 
     def get_recipes_count(self, author):
-        return author.recipe.count()
+        return author.recipes_count
 
     def get_recipes(self, obj):
-        limit = self.context.get('request').GET.get('recipes_limit', 10**10)
-        try:
-            limit = int(limit)
-        except ValueError:
-            raise ValidationError(NOT_INT.format(limit))
+        if hasattr(obj, 'recipes_limited'):
+            recipes = obj.recipes_limited
+        else:
+            recipes = obj.recipe.all()[
+                :get_recipes_limit(self.context.get('request'))]
         return RecipeCutFieldsSerializer(
-            obj.recipe.all()[:limit], many=True, read_only=True).data
+            recipes, many=True, read_only=True).data
 
 
 class IngredientSerializer(serializers.ModelSerializer):
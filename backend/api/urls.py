@@ -2,7 +2,7 @@ from django.urls import include, path
 from rest_framework import routers
 
 from .views import (FoodUserViewSet, IngredientViewSet, RecipeViewSet,
-                    TagViewSet)
+                    StatsView, TagViewSet)
 
 router = routers.DefaultRouter()
 router.register(r'users', FoodUserViewSet, basename='users')
@@ -11,6 +11,7 @@ router.register(r'ingredients', IngredientViewSet, basename='ingredients')
 router.register(r'tags', TagViewSet, basename='tags')
 
 urlpatterns = [
+    path('stats/', StatsView.as_view(), name='stats'),
     path('', include(router.urls)),
     path('', include('djoser.urls')),
     path('auth/', include('djoser.urls.authtoken')),
@@ -1,33 +1,62 @@
-from django.http import FileResponse
+from datetime import datetime
+
+from django.db import transaction
+from django.db.models import Prefetch, prefetch_related_objects
+from django.http import HttpResponseNotModified, StreamingHttpResponse
 from django.shortcuts import get_object_or_404
+from django.utils.http import parse_etags, quote_etag
 from djoser.views import UserViewSet
-from foodgram_project.settings import FILEFORMAT, FILENAME
+from foodgram_project.settings import FILENAME
 from recipes.models import (Favorite, FoodUser, Ingredient, Recipe,
-                            RecipeIngredient, ShoppingCart, Subscription, Tag)
+                            RecipeIngredient, ShoppingCart, ShoppingListItem,
+                            Subscription, Tag)
+from recipes.cache import get_document_cache, get_document_etag
 from recipes.utils import make_doc
 from rest_framework import permissions, status
 from rest_framework.decorators import action
+from rest_framework.parsers import FormParser, MultiPartParser
 from rest_framework.exceptions import ValidationError
-from rest_framework.permissions import IsAuthenticated
+from rest_framework.permissions import IsAdminUser, IsAuthenticated
 from rest_framework.response import Response
+from rest_framework.views import APIView
 from rest_framework.viewsets import ModelViewSet, ReadOnlyModelViewSet
 
 from .filters import IngredientFilter, RecipeFilter
+from .middleware import get_stats
+from .mixins import (RecipeCacheMixin, ReferenceCacheMixin,
+                     response_cache_stats, response_cache_stats_lock)
+from .pagination import RecipePagination
+from .parsers import RecipeJSONParser
 from .permissions import IsAuthor, ReadOnly
+from .renderers import SHOPPING_LIST_RENDERERS
 from .serializers import (IngredientSerializer, RecipeCreateSerializer,
                           RecipeCutFieldsSerializer, RecipeSerializer,
-                          SubscriptionSerializer, TagSerializer)
+                          SubscriptionSerializer, TagSerializer,
+                          get_recipes_limit)
 
 SELF_SUBSCRIPTION = 'Вы не можете подписаться на себя'
 SUBSRIPTION_UNIQUE = 'Вы уже подписаны на этого автора'
 DEL_SUBSRIPTION_UNIQUE = 'Вы не были подписаны на этого автора'
 
+ATTACHMENT = 'attachment; filename="{}.{}"'
+
 RECIPE_UNIQUE = 'Этот рецепт уже добавлен'
 DEL_RECIPE_UNIQUE = 'Что мертво умереть не может'
 
 
+def cache_chunks(document_cache, user_id, etag, chunks):
+    content = []
+    for chunk in chunks:
+        content.append(chunk)
+        yield chunk
+    document_cache.set(user_id, etag, b''.join(content))
+
+
 class FoodUserViewSet(UserViewSet):
 
+    def get_queryset(self):
+        return super().get_queryset().with_is_subscribed(self.request.user)
+
     def get_permissions(self):
         if self.action in ('me',):
             return (IsAuthenticated(),)
@@ -37,9 +66,20 @@ class FoodUserViewSet(UserViewSet):
         detail=False,
         permission_classes=(IsAuthenticated,))
     def subscriptions(self, request):
-        queryset = FoodUser.objects.filter(following__user=request.user)
+        queryset = FoodUser.objects.filter(
+            following__user=request.user
+        ).with_is_subscribed(
+            request.user
+        ).order_by('username')
+        authors = self.paginate_queryset(queryset)
+        prefetch_related_objects(authors, Prefetch(
+            'recipe',
+            queryset=Recipe.objects.filter(
+                author__in=authors
+            ).limit_per_author(get_recipes_limit(request)),
+            to_attr='recipes_limited'))
         serializer = SubscriptionSerializer(
-            self.paginate_queryset(queryset),
+            authors,
             many=True,
             context={'request': request})
         return self.get_paginated_response(serializer.data)
@@ -48,6 +88,7 @@ class FoodUserViewSet(UserViewSet):
         detail=True,
         methods=('post', 'delete',),
         permission_classes=(IsAuthenticated,))
+    @transaction.atomic
     def subscribe(self, request, id=None):
         author = get_object_or_404(FoodUser, id=id)
         user = request.user
@@ -58,6 +99,7 @@ class FoodUserViewSet(UserViewSet):
             if subscription.exists():
                 raise ValidationError(SUBSRIPTION_UNIQUE)
             Subscription.objects.create(user=user, author=author)
+            author.following_count += 1
             serializer = SubscriptionSerializer(
                 author,
                 data=request.data,
@@ -71,15 +113,14 @@ class FoodUserViewSet(UserViewSet):
         return Response(status=status.HTTP_204_NO_CONTENT)
 
 
-class RecipeViewSet(ModelViewSet):
+class RecipeViewSet(RecipeCacheMixin, ModelViewSet):
     filterset_class = RecipeFilter
+    pagination_class = RecipePagination
+    parser_classes = (RecipeJSONParser, FormParser, MultiPartParser)
     permission_classes = (ReadOnly | IsAuthenticated & IsAuthor,)
 
     def get_queryset(self):
-        recipes = Recipe.objects.prefetch_related(
-            'recipe_ingredient__ingredient', 'tags',
-        ).all()
-        return recipes
+        return Recipe.objects.with_user_flags(self.request.user)
 
     def get_serializer_class(self):
         if self.request.method in permissions.SAFE_METHODS:
@@ -88,9 +129,15 @@ class RecipeViewSet(ModelViewSet):
             return RecipeCutFieldsSerializer
         return RecipeCreateSerializer
 
+    @transaction.atomic
     def perform_create(self, serializer):
         serializer.save(author=self.request.user)
 
+    @transaction.atomic
+    def perform_destroy(self, recipe):
+        recipe.delete()
+
+    @transaction.atomic
     def add_delete_recipe(self, user, recipe, model):
         recipe_in_model = model.objects.filter(user=user, recipe=recipe)
         if self.request.method == 'DELETE':
@@ -122,27 +169,58 @@ class RecipeViewSet(ModelViewSet):
         return self.add_delete_recipe(user, recipe, ShoppingCart)
 
     @action(
-        detail=False)
+        detail=False,
+        permission_classes=(IsAuthenticated,),
+        renderer_classes=SHOPPING_LIST_RENDERERS)
     def download_shopping_cart(self, request):
         user = request.user
         if not user.shoppingcarts.exists():
             return Response(status=status.HTTP_400_BAD_REQUEST)
-        doc, date = make_doc(
-            RecipeIngredient.get_shopping_cart_ingredients(user),
-            RecipeIngredient.get_shopping_cart_recipes(user))
-        return FileResponse(
-            doc, content_type=FILEFORMAT, as_attachment=True,
-            filename=FILENAME.format(date))
-
-
-class IngredientViewSet(ReadOnlyModelViewSet):
+        renderer = request.accepted_renderer
+        date = str(datetime.today().date())
+        etag = get_document_etag(user, renderer.format, date)
+        if quote_etag(etag) in parse_etags(
+                request.headers.get('If-None-Match', '')):
+            return HttpResponseNotModified(headers={'ETag': quote_etag(etag)})
+        document_cache = get_document_cache()
+        content = document_cache.get(user.id, etag)
+        if content is not None:
+            chunks = (content,)
+        else:
+            chunks = cache_chunks(
+                document_cache, user.id, etag, make_doc(
+                    ShoppingListItem.get_shopping_cart_ingredients(
+                        user).iterator(),
+                    RecipeIngredient.get_shopping_cart_recipes(user),
+                    date,
+                    renderer.format))
+        response = StreamingHttpResponse(
+            chunks, content_type=renderer.media_type)
+        response['Content-Disposition'] = ATTACHMENT.format(
+            FILENAME.format(date), renderer.format)
+        response['ETag'] = quote_etag(etag)
+        return response
+
+
+class IngredientViewSet(ReferenceCacheMixin, ReadOnlyModelViewSet):
     queryset = Ingredient.objects.all()
     serializer_class = IngredientSerializer
     filterset_class = IngredientFilter
     pagination_class = None
 
 
-class TagViewSet(ReadOnlyModelViewSet):
+class TagViewSet(ReferenceCacheMixin, ReadOnlyModelViewSet):
     queryset = Tag.objects.all()
     serializer_class = TagSerializer
     pagination_class = None
+
+
+class StatsView(APIView):
+    permission_classes = (IsAdminUser,)
+
+    def get(self, request):
+        with response_cache_stats_lock:
+            response_cache = dict(response_cache_stats)
+        return Response({
+            'endpoints': get_stats(),
+            'response_cache': response_cache})
@@ -9,8 +9,11 @@ https://docs.djangoproject.com/en/3.2/howto/deployment/asgi/
 
 import os
 
-from django.core.asgi import get_asgi_application
+import django
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'foodgram_project.settings')
+django.setup(set_prefix=False)
 
-application = get_asgi_application()
+from foodgram_project.handlers import ConcurrentASGIHandler  # noqa: E402
+
+application = ConcurrentASGIHandler()
@@ -0,0 +1,65 @@
+"""
+Gunicorn config: gunicorn -c python:foodgram_project.gunicorn
+
+Every setting can be overridden with the GUNICORN_* environment variables.
+"""
+import multiprocessing
+import os
+
+WORKER_CLASSES = {
+    'sync': 'sync',
+    'gthread': 'gthread',
+    'gevent': 'gevent',
+    'uvicorn': 'uvicorn.workers.UvicornWorker',
+}
+APPLICATIONS = {
+    'uvicorn': 'foodgram_project.asgi:application',
+}
+WSGI_APPLICATION = 'foodgram_project.wsgi:application'
+
+WORKER = os.getenv('GUNICORN_WORKER_CLASS', default='sync')
+
+worker_class = WORKER_CLASSES[WORKER]
+wsgi_app = APPLICATIONS.get(WORKER, WSGI_APPLICATION)
+bind = os.getenv('GUNICORN_BIND', default='0.0.0.0:8000')
+workers = int(os.getenv(
+    'GUNICORN_WORKERS', default=multiprocessing.cpu_count() * 2 + 1))
+# More than one thread turns sync workers into gthread ones.
+threads = int(os.getenv(
+    'GUNICORN_THREADS', default=4 if WORKER == 'gthread' else 1))
+worker_connections = int(os.getenv(
+    'GUNICORN_WORKER_CONNECTIONS', default=1000))
+
+# Import Django once in the master process, workers share it
+# copy-on-write. The PDF fonts are loaded there too, see on_starting.
+preload_app = os.getenv('GUNICORN_PRELOAD', default='True') == 'True'
+
+# Recycle workers to cap memory growth, jitter keeps them from restarting
+# all at once.
+max_requests = int(os.getenv('GUNICORN_MAX_REQUESTS', default=1000))
+max_requests_jitter = int(os.getenv(
+    'GUNICORN_MAX_REQUESTS_JITTER', default=100))
+
+# A shopping list of 5000 products renders to PDF in about 4 seconds
+# (bench_shopping_list), sync workers must not be killed meanwhile.
+timeout = int(os.getenv('GUNICORN_TIMEOUT', default=60))
+graceful_timeout = int(os.getenv('GUNICORN_GRACEFUL_TIMEOUT', default=30))
+keepalive = int(os.getenv('GUNICORN_KEEPALIVE', default=5))
+
+
+def on_starting(server):
+    if preload_app:
+        from recipes.pdf import get_fonts
+
+        get_fonts()
+
+
+def post_fork(server, worker):
+    if preload_app:
+        from django.db import connections
+
+        connections.close_all()
+    if WORKER == 'gevent':
+        from psycogreen.gevent import patch_psycopg
+
+        patch_psycopg()
@@ -0,0 +1,51 @@
+import asyncio
+
+from asgiref.sync import ThreadSensitiveContext, sync_to_async
+from django.core.handlers.asgi import ASGIHandler
+
+from foodgram_project.settings import ASGI_MAX_REQUESTS
+
+
+class ConcurrentASGIHandler(ASGIHandler):
+    """
+    Django 3.2 runs all sync views of a process in one shared thread and
+    iterates streaming responses in the event loop. Here each request gets
+    its own thread for views and streaming chunks, so slow clients and long
+    downloads hold only a coroutine.
+    """
+
+    semaphore = None
+
+    async def __call__(self, scope, receive, send):
+        if self.semaphore is None:
+            self.semaphore = asyncio.Semaphore(ASGI_MAX_REQUESTS)
+        async with self.semaphore:
+            async with ThreadSensitiveContext():
+                await super().__call__(scope, receive, send)
+
+    async def send_response(self, response, send):
+        if not response.streaming:
+            await super().send_response(response, send)
+            return
+        headers = [
+            (str(header).encode('ascii'), str(value).encode('latin1'))
+            for header, value in response.items()]
+        headers.extend(
+            (b'Set-Cookie', cookie.output(header='').encode('ascii').strip())
+            for cookie in response.cookies.values())
+        await send({
+            'type': 'http.response.start',
+            'status': response.status_code,
+            'headers': headers,
+        })
+        parts = iter(response)
+        next_part = sync_to_async(next, thread_sensitive=True)
+        while (part := await next_part(parts, None)) is not None:
+            for chunk, _ in self.chunk_bytes(part):
+                await send({
+                    'type': 'http.response.body',
+                    'body': chunk,
+                    'more_body': True,
+                })
+        await send({'type': 'http.response.body'})
+        await sync_to_async(response.close, thread_sensitive=True)()
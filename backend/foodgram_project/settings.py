@@ -2,8 +2,6 @@ import os
 from pathlib import Path
 
 from dotenv import load_dotenv
-from reportlab.pdfbase import pdfmetrics
-from reportlab.pdfbase.ttfonts import TTFont
 
 load_dotenv()
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
@@ -70,6 +68,7 @@ DJOSER = {
 }
 
 MIDDLEWARE = [
+    'api.middleware.ProfilingMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -121,6 +120,7 @@ else:
             'PORT': os.getenv('DB_PORT', 5432),
         }
     }
+    INSTALLED_APPS.append('django.contrib.postgres')
 
 
 # Password validation
@@ -184,19 +184,92 @@ LENGTHS = {
     'RECIPE_NAME': 200,
     'INGREDIENT_NAME': 200,
     'INGREDIENT_MEASURE': 200,
+    'REFERENCE_NAME': 100,
 }
 
 # Username validation
 REGEX_USERNAME = r'^[\w.@+-]+'
 
+# Ingredient search settings
+INGREDIENT_SEARCH_LIMIT = 50
+
+# Reference data (tags, ingredients) cache settings
+REFERENCE_CACHE_SIZE = 1000
+
+# Document caches: the cache name is the default key prefix
+# (DjangoDocumentCache) or MEDIA_ROOT subdirectory (FileDocumentCache),
+# options of other backends are ignored.
+# Anonymous recipe responses cache settings
+RESPONSE_CACHE = {
+    'BACKEND': 'recipes.cache.LocMemDocumentCache',  # 'recipes.cache.FileDocumentCache' 'recipes.cache.DjangoDocumentCache'
+    'OPTIONS': {'max_entries': 1000},
+}
+
+# Seconds an anonymous ?ordering=popular page may lag behind favorites
+POPULAR_CACHE_TIMEOUT = 60
+
+# Serialized recipe fragments cache settings, the backend must keep objects
+FRAGMENT_CACHE = {
+    'BACKEND': 'recipes.cache.LocMemDocumentCache',  # 'recipes.cache.DjangoDocumentCache'
+    'OPTIONS': {'max_entries': 10000},
+}
+
+# Per-endpoint query count and timing instrumentation, it sends query
+# counts and timings to every client in the Server-Timing header
+PROFILING = os.getenv('PROFILING', default=str(DEBUG)) == 'True'
+QUERY_BUDGET_STRICT = os.getenv('QUERY_BUDGET_STRICT') == 'True'
+# Measured with TokenAuthentication and a cold fragment cache
+# (tests.test_query_budgets)
+QUERY_BUDGETS = {
+    'recipes-list': 8,
+    'recipes-retrieve': 7,
+    'recipes-favorite': 7,
+    'recipes-shopping_cart': 12,
+    'recipes-download_shopping_cart': 5,
+    'users-subscriptions': 4,
+    'users-subscribe': 9,
+}
+
+# ASGI mode: requests served concurrently by one worker process. Each of
+# them runs in its own thread with its own database connection, so
+# ASGI_MAX_REQUESTS * GUNICORN_WORKERS must stay below PostgreSQL
+# max_connections (100 by default) minus other clients.
+ASGI_MAX_REQUESTS = int(os.getenv('ASGI_MAX_REQUESTS', default=8))
+STARTUP_IMPORT_BUDGET = int(os.getenv(
+    'STARTUP_IMPORT_BUDGET', default=1500))
+
+# Admin settings
+ADMIN_FILTER_CACHE_TIMEOUT = 10 * 60
+
+# Subscriptions settings
+RECIPES_LIMIT_MAX = 30
+
+# Recipe image renditions settings
+IMAGE_RENDITIONS = {
+    'thumb': (160, 160),
+    'card': (480, 480),
+    'full': (1280, 1280),
+}
+IMAGE_RENDITION_FORMAT = 'WEBP'
+IMAGE_RENDITION_QUALITY = 80
+IMAGE_WORKERS = 2
+
+# Recipe image upload limits
+IMAGE_UPLOAD_MAX_SIZE = 10 * 1024 * 1024
+IMAGE_UPLOAD_MAX_PIXELS = 40_000_000
+RECIPE_REQUEST_MAX_SIZE = IMAGE_UPLOAD_MAX_SIZE * 4 // 3 + 1024 * 1024
+
 # Shopping list settings
-FILEFORMAT = 'application/pdf'  # 'text/plain' 'application/pdf'
+FILEFORMAT = 'application/pdf'  # 'text/plain' 'text/csv' 'application/json'
 FILENAME = 'shopping_list_{}'
+SHOPPING_LIST_CACHE = {
+    'BACKEND': 'recipes.cache.DjangoDocumentCache',  # 'recipes.cache.LocMemDocumentCache' 'recipes.cache.FileDocumentCache'
+    'OPTIONS': {},
+}
 
 # PDF fonts settings
 BIG_FONT = 'Montserrat-Bold'
 SMALL_FONT = 'Montserrat-Medium'
 BIG_FONT_SIZE = 20
 SMALL_FONT_SIZE = 13
-pdfmetrics.registerFont(TTFont(BIG_FONT, BIG_FONT + '.ttf'))
-pdfmetrics.registerFont(TTFont(SMALL_FONT, SMALL_FONT + '.ttf'))
+FONTS_ROOT = BASE_DIR / 'fonts'
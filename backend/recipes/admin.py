@@ -4,12 +4,18 @@ from django import forms
 from django.contrib import admin
 from django.contrib.auth.admin import UserAdmin
 from django.contrib.auth.models import Group
+from django.core.cache import cache
+from django.db.models import Count, Max
 from django.utils.safestring import mark_safe
 from django.utils.translation import gettext_lazy as _
 
+from foodgram_project.settings import ADMIN_FILTER_CACHE_TIMEOUT
+from .images import schedule_renditions
 from .models import (Favorite, FoodUser, Ingredient, Recipe, RecipeIngredient,
                      ShoppingCart, Subscription, Tag)
 
+COOKING_SPEED_CACHE_KEY = 'admin:cooking_speed_thresholds'
+
 admin.site.unregister(Group)
 
 
@@ -21,27 +27,16 @@ class FoodUserAdmin(UserAdmin):
         'email',
         'first_name',
         'last_name',
-        'count_recipes',
-        'count_follower',
-        'count_following')
+        'recipes_count',
+        'follower_count',
+        'following_count')
     search_fields = ('username',)
 
-    @admin.display(description='рецепты')
-    def count_recipes(self, user):
-        return user.recipe.count()
-
-    @admin.display(description='подписки')
-    def count_follower(self, user):
-        return user.follower.count()
-
-    @admin.display(description='подписчики')
-    def count_following(self, user):
-        return user.following.count()
-
 
 @admin.register(Subscription)
 class SubscriptionAdmin(admin.ModelAdmin):
     list_display = ('user', 'author',)
+    list_select_related = ('user', 'author',)
     search_fields = ('user',)
 
 
@@ -68,6 +63,7 @@ class TagAdmin(admin.ModelAdmin):
 
 class RecipeIngredientInLine(admin.StackedInline):
     model = RecipeIngredient
+    autocomplete_fields = ('ingredient',)
     extra = 1
     min_num = 1
 
@@ -76,16 +72,30 @@ class CookingSpeedFilter(admin.SimpleListFilter):
     title = _('Время приготовления')
     parameter_name = 'speed'
 
+    def get_thresholds(self, queryset):
+        stats = queryset.aggregate(count=Count('id'), max=Max('cooking_time'))
+        if not stats['count']:
+            return None
+        times = queryset.order_by('cooking_time').values_list(
+            'cooking_time', flat=True)
+        return (
+            times[stats['count'] // 3],
+            times[stats['count'] * 2 // 3],
+            stats['max'])
+
     def lookups(self, request, model_admin):
-        if not (
-            times := sorted(model_admin.get_queryset(
-                request).values_list('cooking_time', flat=True))):
+        thresholds = cache.get(COOKING_SPEED_CACHE_KEY)
+        if thresholds is None:
+            thresholds = self.get_thresholds(Recipe.objects.all())
+            cache.set(
+                COOKING_SPEED_CACHE_KEY, thresholds,
+                ADMIN_FILTER_CACHE_TIMEOUT)
+        if not thresholds:
             return
-        threshold_1 = times[len(times) // 3]
-        threshold_2 = times[len(times) * 2 // 3]
+        threshold_1, threshold_2, slowest = thresholds
         fast = (0, threshold_1 - 1)
         medium = (threshold_1, threshold_2 - 1)
-        slow = (threshold_2, times[-1])
+        slow = (threshold_2, slowest)
         return (
             (fast, _(f'Быстро: до {fast[1]} минут')),
             (medium, _(f'Средне: {medium[0]} - {medium[1]} минут')),
@@ -105,11 +115,11 @@ class RecipeAdmin(admin.ModelAdmin):
         'text',
         'cooking_time',
         'image_preview_small',
-        'count_in_favorites',
+        'favorites_count',
         'ingredients_all',
         'tags_all')
     readonly_fields = (
-        'count_in_favorites',
+        'favorites_count',
         'image_preview_big',
         'tags_all',
         'ingredients_all')
@@ -119,20 +129,30 @@ class RecipeAdmin(admin.ModelAdmin):
     list_filter = (
         CookingSpeedFilter,
         ('tags', admin.RelatedOnlyFieldListFilter))
+    autocomplete_fields = ('author',)
 
-    @admin.display(description='в избранных')
-    def count_in_favorites(self, recipe):
-        return recipe.favorites.count()
+    def get_queryset(self, request):
+        return super().get_queryset(request).prefetch_related(
+            'tags', 'ingredients')
+
+    def save_model(self, request, recipe, form, change):
+        if 'image' in form.changed_data:
+            recipe.image_renditions = {}
+        super().save_model(request, recipe, form, change)
+        if 'image' in form.changed_data:
+            schedule_renditions(recipe)
 
     @admin.display(description='изображение')
     def image_preview_big(self, recipe):
         return mark_safe(
-            f'<img src="{recipe.image.url}" style="max-height: 350px;">')
+            f'<img src="{recipe.get_image_url("card")}" '
+            'style="max-height: 350px;">')
 
     @admin.display(description='изображение')
     def image_preview_small(self, recipe):
         return mark_safe(
-            f'<img src="{recipe.image.url}" style="max-height: 100px;">')
+            f'<img src="{recipe.get_image_url("thumb")}" '
+            'style="max-height: 100px;">')
 
     @admin.display(description='теги')
     def tags_all(self, recipe):
@@ -150,18 +170,24 @@ class IngredientAdmin(admin.ModelAdmin):
     search_fields = ('name', 'measurement_unit',)
     list_filter = ('measurement_unit',)
 
-    @admin.display(description='в рецептах')
+    def get_queryset(self, request):
+        return super().get_queryset(request).annotate(
+            recipes_count=Count('recipe_ingredient'))
+
+    @admin.display(description='в рецептах', ordering='recipes_count')
     def count_in_recipes(self, ingredient):
-        return ingredient.recipe_ingredient.count()
+        return ingredient.recipes_count
 
 
 @admin.register(ShoppingCart)
 class ShoppingCartAdmin(admin.ModelAdmin):
     list_display = ('id', 'user', 'recipe',)
+    list_select_related = ('user', 'recipe',)
     search_fields = ('recipe',)
 
 
 @admin.register(Favorite)
 class FavoriteAdmin(admin.ModelAdmin):
     list_display = ('id', 'user', 'recipe',)
+    list_select_related = ('user', 'recipe',)
     search_fields = ('recipe',)
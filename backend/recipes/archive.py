@@ -0,0 +1,9 @@
+import json
+
+RECIPES_FILE = 'recipes.ndjson'
+TAGS_FILE = 'tags.ndjson'
+IMAGES_DIR = 'images'
+
+
+def write_line(file, data):
+    file.write(json.dumps(data, ensure_ascii=False) + '\n')
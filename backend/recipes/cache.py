@@ -0,0 +1,125 @@
+import shutil
+import threading
+from collections import OrderedDict
+from functools import lru_cache
+from pathlib import Path
+
+from django.core.cache import caches
+from django.utils.crypto import salted_hmac
+from django.utils.module_loading import import_string
+
+from foodgram_project.settings import (FRAGMENT_CACHE, MEDIA_ROOT,
+                                       RESPONSE_CACHE, SHOPPING_LIST_CACHE)
+
+ETAG_SALT = 'recipes.cache.shopping_list'
+
+
+# Backends take the cache name first and ignore options meant for
+# other backends, so a cache config can switch BACKEND alone.
+class LocMemDocumentCache:
+
+    def __init__(self, name=None, max_entries=1000, **options):
+        self.max_entries = max_entries
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+
+    def get(self, user_id, etag):
+        with self.lock:
+            entry = self.entries.get(user_id)
+            if entry is None or entry[0] != etag:
+                return None
+            self.entries.move_to_end(user_id)
+            return entry[1]
+
+    def set(self, user_id, etag, content):
+        with self.lock:
+            self.entries[user_id] = (etag, content)
+            self.entries.move_to_end(user_id)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+
+    def delete(self, *user_ids):
+        with self.lock:
+            for user_id in user_ids:
+                self.entries.pop(user_id, None)
+
+
+class FileDocumentCache:
+
+    def __init__(self, name, location=None, **options):
+        self.location = Path(location or MEDIA_ROOT / name)
+
+    def get(self, user_id, etag):
+        try:
+            return (self.location / str(user_id) / etag).read_bytes()
+        except FileNotFoundError:
+            return None
+
+    def set(self, user_id, etag, content):
+        directory = self.location / str(user_id)
+        self.delete(user_id)
+        directory.mkdir(parents=True, exist_ok=True)
+        temp_path = directory / f'{etag}.tmp'
+        temp_path.write_bytes(content)
+        temp_path.replace(directory / etag)
+
+    def delete(self, *user_ids):
+        for user_id in user_ids:
+            shutil.rmtree(self.location / str(user_id), ignore_errors=True)
+
+
+class DjangoDocumentCache:
+
+    def __init__(self, name, alias='default', timeout=None, prefix=None,
+                 **options):
+        self.alias = alias
+        self.timeout = timeout
+        self.prefix = prefix or name
+
+    @property
+    def cache(self):
+        return caches[self.alias]
+
+    def make_key(self, user_id):
+        return f'{self.prefix}:{user_id}'
+
+    def get(self, user_id, etag):
+        entry = self.cache.get(self.make_key(user_id))
+        if entry is None or entry[0] != etag:
+            return None
+        return entry[1]
+
+    def set(self, user_id, etag, content):
+        self.cache.set(
+            self.make_key(user_id), (etag, content), timeout=self.timeout)
+
+    def delete(self, *user_ids):
+        self.cache.delete_many(
+            [self.make_key(user_id) for user_id in user_ids])
+
+
+def load_cache(name, config):
+    return import_string(config['BACKEND'])(
+        name, **config.get('OPTIONS', {}))
+
+
+@lru_cache(maxsize=None)
+def get_document_cache():
+    return load_cache('shopping_lists', SHOPPING_LIST_CACHE)
+
+
+@lru_cache(maxsize=None)
+def get_response_cache():
+    return load_cache('recipe_responses', RESPONSE_CACHE)
+
+
+@lru_cache(maxsize=None)
+def get_fragment_cache():
+    return load_cache('recipe_fragments', FRAGMENT_CACHE)
+
+
+def get_document_etag(user, *parts):
+    cart = user.shoppingcarts.values_list(
+        'recipe_id', 'recipe__updated').order_by('recipe_id')
+    return salted_hmac(
+        ETAG_SALT, repr((parts, list(cart)))).hexdigest()
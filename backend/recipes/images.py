@@ -0,0 +1,81 @@
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+from io import BytesIO
+from pathlib import PurePosixPath
+
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import connection, connections, transaction
+from django.utils import timezone
+from PIL import Image, ImageOps
+
+from foodgram_project.settings import (IMAGE_RENDITION_FORMAT,
+                                       IMAGE_RENDITION_QUALITY,
+                                       IMAGE_RENDITIONS, IMAGE_WORKERS)
+from .models import Recipe, ReferenceVersion
+
+RENDITIONS_DIR = 'recipe_images/renditions'
+RENDITION_FAILED = 'Не удалось подготовить изображения рецепта %s'
+
+logger = logging.getLogger(__name__)
+
+
+@lru_cache(maxsize=None)
+def get_executor():
+    return ThreadPoolExecutor(
+        max_workers=IMAGE_WORKERS, thread_name_prefix='image_renditions')
+
+
+def get_rendition_name(image_name, rendition):
+    return (
+        f'{RENDITIONS_DIR}/{PurePosixPath(image_name).stem}_{rendition}.'
+        f'{IMAGE_RENDITION_FORMAT.lower()}')
+
+
+def render_image(image, size):
+    image = image.copy()
+    image.thumbnail(size)
+    buffer = BytesIO()
+    image.save(
+        buffer, IMAGE_RENDITION_FORMAT, quality=IMAGE_RENDITION_QUALITY)
+    return buffer.getvalue()
+
+
+def make_renditions(recipe_id, image_name):
+    with default_storage.open(image_name) as file:
+        image = ImageOps.exif_transpose(Image.open(file))
+        if image.mode not in ('RGB', 'RGBA'):
+            image = image.convert('RGBA')
+        renditions = {}
+        for rendition, size in IMAGE_RENDITIONS.items():
+            name = get_rendition_name(image_name, rendition)
+            default_storage.delete(name)
+            renditions[rendition] = default_storage.save(
+                name, ContentFile(render_image(image, size)))
+    if Recipe.objects.filter(id=recipe_id, image=image_name).update(
+            image_renditions=renditions, updated=timezone.now()):
+        ReferenceVersion.bump(Recipe)
+    return renditions
+
+
+def run_renditions(recipe_id, image_name, in_background=True):
+    try:
+        return make_renditions(recipe_id, image_name)
+    except Exception:
+        logger.exception(RENDITION_FAILED, recipe_id)
+    finally:
+        if in_background:
+            connections.close_all()
+
+
+def schedule_renditions(recipe):
+    recipe_id, image_name = recipe.id, recipe.image.name
+    if connection.vendor == 'sqlite':
+        # SQLite has a single writer, a background UPDATE would collide
+        # with the next request's transaction ("database is locked").
+        transaction.on_commit(lambda: run_renditions(
+            recipe_id, image_name, in_background=False))
+        return
+    transaction.on_commit(lambda: get_executor().submit(
+        run_renditions, recipe_id, image_name))
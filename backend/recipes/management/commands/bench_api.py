@@ -0,0 +1,381 @@
+import json
+import math
+import random
+import re
+import subprocess
+import threading
+import time
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from io import StringIO
+from unittest import mock
+from urllib.error import HTTPError, URLError
+from urllib.parse import quote
+from urllib.request import Request, urlopen
+
+from django.conf import settings
+from django.contrib.auth.hashers import make_password
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.test.utils import (setup_test_environment,
+                               teardown_test_environment)
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+
+from api import middleware
+from recipes.models import (Favorite, FoodUser, Ingredient, Recipe,
+                            RecipeIngredient, ReferenceVersion, ShoppingCart,
+                            ShoppingListItem, Subscription, Tag)
+
+PREFIX = 'bench_api_'
+BENCH_IMAGE = 'recipe_images/bench.png'
+REQUEST_TIMEOUT = 10
+QUERIES = re.compile(r'desc="(\d+) queries"')
+SCENARIOS = (
+    ('recipes-list anonymous', ('get',), '/api/recipes/?page={page}', False),
+    ('recipes-list', ('get',), '/api/recipes/?page={page}', True),
+    ('recipes-list tags', ('get',), '/api/recipes/?tags={tag}', True),
+    ('recipes-list popular', ('get',), '/api/recipes/?ordering=popular',
+     False),
+    ('recipes-list favorited', ('get',), '/api/recipes/?is_favorited=1',
+     True),
+    ('recipes-retrieve anonymous', ('get',), '/api/recipes/{recipe}/', False),
+    ('recipes-retrieve', ('get',), '/api/recipes/{recipe}/', True),
+    ('recipes-favorite', ('post', 'delete'),
+     '/api/recipes/{recipe}/favorite/', True),
+    ('recipes-shopping_cart', ('post', 'delete'),
+     '/api/recipes/{recipe}/shopping_cart/', True),
+    ('recipes-download_shopping_cart', ('get',),
+     '/api/recipes/download_shopping_cart/', True),
+    ('ingredients-list', ('get',), '/api/ingredients/?name={ingredient}',
+     False),
+    ('tags-list', ('get',), '/api/tags/', False),
+    ('users-list', ('get',), '/api/users/', True),
+    ('users-subscriptions', ('get',), '/api/users/subscriptions/', True),
+    ('users-subscribe', ('post', 'delete'), '/api/users/{author}/subscribe/',
+     True),
+)
+
+CONCURRENCY_NEEDS_URL = (
+    'Параллельные запросы возможны только к запущенному серверу (--url)')
+GENERATED = 'Синтетические данные: {}'
+NO_SERVER_TIMING = (
+    '{} не вернул заголовок Server-Timing с числом запросов к базе; '
+    'запустите сервер с PROFILING=True')
+REUSED = 'Используются сохранённые синтетические данные: {}'
+RUNNING = '{name}: {requests} запросов'
+SAVED = 'Результаты сохранены в {}'
+
+
+class Rollback(Exception):
+    pass
+
+
+def percentile(values, fraction):
+    ordered = sorted(values)
+    return ordered[max(0, math.ceil(fraction * len(ordered)) - 1)]
+
+
+def get_commit():
+    try:
+        return subprocess.run(
+            ('git', 'rev-parse', '--short', 'HEAD'),
+            cwd=settings.BASE_DIR, capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+class Command(BaseCommand):
+    help = (
+        'Нагрузочный замер API на синтетических данных: задержки, '
+        'пропускная способность и число запросов к базе по эндпоинтам')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=100)
+        parser.add_argument('--recipes', type=int, default=2000)
+        parser.add_argument('--ingredients-per-recipe', type=int, default=8)
+        parser.add_argument('--favorites', type=int, default=20)
+        parser.add_argument('--carts', type=int, default=5)
+        parser.add_argument('--subscriptions', type=int, default=10)
+        parser.add_argument(
+            '--requests', type=int, default=100,
+            help='Запросов на каждый эндпоинт')
+        parser.add_argument('--warmup', type=int, default=10)
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument(
+            '--url',
+            help='Адрес запущенного сервера, например http://127.0.0.1:8000; '
+                 'по умолчанию запросы идут через тестовый клиент Django')
+        parser.add_argument('--concurrency', type=int, default=1)
+        parser.add_argument(
+            '--endpoints',
+            nargs='+',
+            choices=[scenario[0] for scenario in SCENARIOS],
+            help='Замерить только эти эндпоинты')
+        parser.add_argument(
+            '--keep',
+            action='store_true',
+            help='Не удалять синтетические данные после замера')
+        parser.add_argument('--output', help='JSON файл для результатов')
+
+    def handle(self, *args, **options):
+        if options['concurrency'] > 1 and not options['url']:
+            raise CommandError(CONCURRENCY_NEEDS_URL)
+        self.rng = random.Random(options['seed'])
+        if options['url'] or options['keep']:
+            report = self.run(options)
+            if not options['keep']:
+                FoodUser.objects.filter(username__startswith=PREFIX).delete()
+        else:
+            setup_test_environment()
+            try:
+                # Query counts come from the profiling middleware's
+                # Server-Timing header, so it is on for in-process runs.
+                with mock.patch.object(middleware, 'PROFILING', True), \
+                        transaction.atomic():
+                    report = self.run(options)
+                    raise Rollback
+            except Rollback:
+                pass
+            finally:
+                teardown_test_environment()
+        content = json.dumps(report, ensure_ascii=False, indent=2)
+        if options['output']:
+            with open(options['output'], 'w', encoding='utf-8') as file:
+                file.write(content)
+            self.stderr.write(SAVED.format(options['output']))
+        else:
+            self.stdout.write(content)
+
+    def run(self, options):
+        if FoodUser.objects.filter(username__startswith=PREFIX).exists():
+            dataset = self.load_dataset()
+            self.stderr.write(REUSED.format(dataset))
+        else:
+            dataset = self.generate(options)
+            self.stderr.write(GENERATED.format(dataset))
+        self.session = threading.local()
+        return {
+            'commit': get_commit(),
+            'target': options['url'] or 'test client',
+            'concurrency': options['concurrency'],
+            'seed': options['seed'],
+            'dataset': dataset,
+            'endpoints': {
+                name: result
+                for scenario in SCENARIOS
+                if not options['endpoints']
+                or scenario[0] in options['endpoints']
+                for name, result in self.measure(
+                    scenario, options).items()}}
+
+    def generate(self, options):
+        # Reference data is imported into empty tables only, so a run
+        # against a real database (--url, --keep) leaves its catalog alone.
+        log = StringIO()
+        if not Ingredient.objects.exists():
+            call_command(
+                'import_reference', 'ingredients',
+                file=settings.CSVDATA_ROOT / 'ingredients.csv', format='csv',
+                stdout=log, stderr=log)
+        if not Tag.objects.exists():
+            call_command('import_reference', 'tags', stdout=log, stderr=log)
+        ingredients = list(Ingredient.objects.values_list('id', flat=True))
+        tags = list(Tag.objects.all())
+        password = make_password(None)
+        FoodUser.objects.bulk_create(
+            FoodUser(
+                email=f'{PREFIX}{index}@example.com',
+                username=f'{PREFIX}{index}',
+                first_name=PREFIX,
+                last_name=PREFIX,
+                password=password)
+            for index in range(options['users'] + 1))
+        users = list(FoodUser.objects.filter(
+            username__startswith=PREFIX).order_by('id'))
+        Token.objects.bulk_create(
+            Token(user=user, key=Token.generate_key()) for user in users)
+        readers = users[:-1]
+        recipe_tags = [
+            self.rng.sample(tags, self.rng.randint(1, min(3, len(tags))))
+            for _ in range(options['recipes'])]
+        Recipe.objects.bulk_create(
+            Recipe(
+                author=self.rng.choice(readers),
+                name=f'{PREFIX}{index}',
+                image=BENCH_IMAGE,
+                text=PREFIX,
+                cooking_time=self.rng.randint(1, 240),
+                tags_mask=Tag.get_mask(chosen))
+            for index, chosen in enumerate(recipe_tags))
+        recipes = list(Recipe.objects.filter(
+            author__in=readers).order_by('id').values_list('id', flat=True))
+        Recipe.tags.through.objects.bulk_create(
+            Recipe.tags.through(recipe_id=recipe, tag_id=tag.id)
+            for recipe, chosen in zip(recipes, recipe_tags)
+            for tag in chosen)
+        RecipeIngredient.objects.bulk_create(
+            RecipeIngredient(
+                recipe_id=recipe,
+                ingredient_id=ingredient,
+                amount=self.rng.randint(1, 500))
+            for recipe in recipes
+            for ingredient in self.rng.sample(
+                ingredients, options['ingredients_per_recipe']))
+        for model, count in (
+            (Favorite, options['favorites']),
+            (ShoppingCart, options['carts']),
+        ):
+            model.objects.bulk_create(
+                model(user=user, recipe_id=recipe)
+                for user in readers
+                for recipe in self.rng.sample(recipes, count))
+        Subscription.objects.bulk_create(
+            Subscription(user=user, author=author)
+            for user in readers
+            for author in self.rng.sample(
+                [author for author in readers if author != user],
+                options['subscriptions']))
+        for user_id, recipe_id in ShoppingCart.objects.filter(
+                user__in=readers).values_list('user_id', 'recipe_id'):
+            ShoppingListItem.add_recipe(user_id, recipe_id)
+        call_command('reconcile_counters', stdout=log)
+        ReferenceVersion.bump(Recipe)
+        return self.load_dataset()
+
+    def load_dataset(self):
+        users = list(FoodUser.objects.filter(
+            username__startswith=PREFIX).order_by('id'))
+        tokens = dict(
+            Token.objects.filter(user__in=users).values_list('user_id', 'key'))
+        self.readers = [tokens[user.id] for user in users[:-1]]
+        self.writer = tokens[users[-1].id]
+        self.authors = [user.id for user in users[:-1]]
+        self.recipes = list(Recipe.objects.filter(
+            author__in=users).values_list('id', flat=True))
+        self.tags = list(Tag.objects.values_list('slug', flat=True))
+        self.ingredients = list(
+            Ingredient.objects.values_list('name', flat=True))
+        return {
+            'users': len(self.readers),
+            'recipes': len(self.recipes),
+            'tags': len(self.tags),
+            'ingredients': len(self.ingredients),
+            'recipe_ingredients': RecipeIngredient.objects.filter(
+                recipe__author__in=users).count(),
+            'favorites': Favorite.objects.filter(user__in=users).count(),
+            'carts': ShoppingCart.objects.filter(user__in=users).count(),
+            'subscriptions': Subscription.objects.filter(
+                user__in=users).count()}
+
+    def make_jobs(self, scenario, count):
+        _, methods, path, authenticated = scenario
+        jobs = []
+        for _ in range(count):
+            token = None
+            if authenticated:
+                token = (
+                    self.writer if len(methods) > 1
+                    else self.rng.choice(self.readers))
+            jobs.append((path.format(
+                page=self.rng.randint(1, 3),
+                recipe=self.rng.choice(self.recipes),
+                author=self.rng.choice(self.authors),
+                tag=self.rng.choice(self.tags),
+                ingredient=quote(self.rng.choice(self.ingredients)[:3]),
+            ), token))
+        return jobs
+
+    def measure(self, scenario, options):
+        name, methods, _, _ = scenario
+        self.stderr.write(RUNNING.format(
+            name=name, requests=options['requests']))
+        send = self.send_http if options['url'] else self.send_client
+        samples = defaultdict(list)
+        lock = threading.Lock()
+
+        def run_job(job, record=True):
+            path, token = job
+            for method in methods:
+                sample = send(options['url'], method, path, token)
+                if record:
+                    with lock:
+                        samples[method].append(sample)
+
+        for job in self.make_jobs(scenario, options['warmup']):
+            run_job(job, record=False)
+        jobs = self.make_jobs(scenario, options['requests'])
+        started = time.perf_counter()
+        if options['concurrency'] > 1:
+            with ThreadPoolExecutor(options['concurrency']) as executor:
+                list(executor.map(run_job, jobs))
+        else:
+            for job in jobs:
+                run_job(job)
+        elapsed = time.perf_counter() - started
+        if any(
+            status is not None and status < 400 and count is None
+            for method in methods for _, status, count in samples[method]
+        ):
+            raise CommandError(NO_SERVER_TIMING.format(options['url']))
+        return {
+            f'{name} {method.upper()}': self.summarize(
+                samples[method], elapsed)
+            for method in methods}
+
+    def summarize(self, samples, elapsed):
+        durations = [duration for duration, _, _ in samples]
+        queries = [count for _, _, count in samples if count is not None]
+        return {
+            'requests': len(samples),
+            'errors': sum(
+                status is None or status >= 400 for _, status, _ in samples),
+            'throughput': round(len(samples) / elapsed, 1),
+            'mean': round(sum(durations) / len(durations), 2),
+            'p50': round(percentile(durations, 0.5), 2),
+            'p95': round(percentile(durations, 0.95), 2),
+            'p99': round(percentile(durations, 0.99), 2),
+            'queries': {
+                'mean': round(sum(queries) / len(queries), 1),
+                'max': max(queries),
+            } if queries else None}
+
+    def get_queries(self, server_timing):
+        match = QUERIES.search(server_timing or '')
+        return int(match.group(1)) if match else None
+
+    def send_client(self, url, method, path, token):
+        client = getattr(self.session, 'client', None)
+        if client is None:
+            client = self.session.client = APIClient()
+        headers = {'HTTP_AUTHORIZATION': f'Token {token}'} if token else {}
+        started = time.perf_counter()
+        response = client.generic(method.upper(), path, **headers)
+        if response.streaming:
+            b''.join(response.streaming_content)
+        duration = (time.perf_counter() - started) * 1000
+        return (
+            duration,
+            response.status_code,
+            self.get_queries(response.get('Server-Timing')))
+
+    def send_http(self, url, method, path, token):
+        request = Request(url.rstrip('/') + path, method=method.upper())
+        if token:
+            request.add_header('Authorization', f'Token {token}')
+        started = time.perf_counter()
+        try:
+            with urlopen(request, timeout=REQUEST_TIMEOUT) as response:
+                response.read()
+                status = response.status
+                server_timing = response.headers.get('Server-Timing')
+        except HTTPError as error:
+            error.read()
+            status = error.code
+            server_timing = error.headers.get('Server-Timing')
+        except (URLError, OSError):
+            status = server_timing = None
+        duration = (time.perf_counter() - started) * 1000
+        return duration, status, self.get_queries(server_timing)
@@ -0,0 +1,179 @@
+import json
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from io import StringIO
+from pathlib import Path
+from urllib.error import URLError
+from urllib.request import urlopen
+
+from django.conf import settings
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+
+from recipes.management.commands.bench_api import PREFIX
+from recipes.models import FoodUser
+
+SERVERS = {
+    'wsgi': ('foodgram_project.wsgi',),
+    'asgi': ('-k', 'uvicorn.workers.UvicornWorker', 'foodgram_project.asgi'),
+}
+ENDPOINTS = (
+    'recipes-list anonymous',
+    'recipes-list',
+    'recipes-retrieve',
+    'ingredients-list',
+    'tags-list',
+)
+READY_PATH = '/api/tags/'
+READY_TIMEOUT = 30
+SLOW_HEADER_INTERVAL = 0.5
+
+SERVER_FAILED = 'Сервер {mode} не запустился за {timeout} с'
+STARTED = 'Сервер {mode}: {workers} процесса, порт {port}'
+LEVEL = '{mode}: параллельных запросов {concurrency}, медленных {slow}'
+SAVED = 'Результаты сохранены в {}'
+
+
+def slow_client(port, stop):
+    with socket.create_connection(
+            ('127.0.0.1', port), timeout=READY_TIMEOUT) as connection:
+        connection.sendall(
+            f'GET {READY_PATH} HTTP/1.1\r\nHost: 127.0.0.1\r\n'.encode())
+        while not stop.wait(SLOW_HEADER_INTERVAL):
+            try:
+                connection.sendall(b'X-Slow-Client: 1\r\n')
+            except OSError:
+                return
+        try:
+            connection.sendall(b'Connection: close\r\n\r\n')
+            while connection.recv(65536):
+                pass
+        except OSError:
+            pass
+
+
+class Command(BaseCommand):
+    help = (
+        'Сравнение задержек и пропускной способности gunicorn с '
+        'синхронными (WSGI) и асинхронными (ASGI, uvicorn) воркерами '
+        'при разном числе параллельных и медленных клиентов')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--modes', nargs='+', choices=SERVERS, default=list(SERVERS))
+        parser.add_argument('--workers', type=int, default=2)
+        parser.add_argument(
+            '--concurrency', nargs='+', type=int, default=[1, 8, 32])
+        parser.add_argument(
+            '--slow-clients', type=int, default=4,
+            help='Клиентов, медленно отправляющих заголовки запроса')
+        parser.add_argument('--requests', type=int, default=100)
+        parser.add_argument('--warmup', type=int, default=10)
+        parser.add_argument('--port', type=int, default=8100)
+        parser.add_argument(
+            '--endpoints', nargs='+', default=list(ENDPOINTS))
+        parser.add_argument('--users', type=int, default=100)
+        parser.add_argument('--recipes', type=int, default=2000)
+        parser.add_argument('--output', help='JSON файл для результатов')
+
+    def handle(self, *args, **options):
+        created = not FoodUser.objects.filter(
+            username__startswith=PREFIX).exists()
+        report = {
+            'workers': options['workers'],
+            'slow_clients': options['slow_clients'],
+            'modes': {}}
+        try:
+            for mode in options['modes']:
+                report['modes'][mode] = self.bench_mode(mode, options)
+        finally:
+            if created:
+                FoodUser.objects.filter(username__startswith=PREFIX).delete()
+        content = json.dumps(report, ensure_ascii=False, indent=2)
+        if options['output']:
+            with open(options['output'], 'w', encoding='utf-8') as file:
+                file.write(content)
+            self.stderr.write(SAVED.format(options['output']))
+        else:
+            self.stdout.write(content)
+
+    def bench_mode(self, mode, options):
+        port = options['port']
+        server = subprocess.Popen(
+            (sys.executable, '-m', 'gunicorn',
+             '--bind', f'127.0.0.1:{port}',
+             '--workers', str(options['workers']),
+             *SERVERS[mode]),
+            cwd=settings.BASE_DIR,
+            env={
+                **os.environ,
+                'DJANGO_SETTINGS_MODULE': settings.SETTINGS_MODULE,
+                'PROFILING': 'True',
+                'PYTHONPATH': os.pathsep.join(sys.path)},
+            stdout=subprocess.DEVNULL,
+            stderr=subprocess.DEVNULL)
+        try:
+            self.wait_ready(mode, port)
+            self.stderr.write(STARTED.format(
+                mode=mode, workers=options['workers'], port=port))
+            results = {}
+            for slow in sorted({0, options['slow_clients']}):
+                for concurrency in options['concurrency']:
+                    self.stderr.write(LEVEL.format(
+                        mode=mode, concurrency=concurrency, slow=slow))
+                    results[f'{concurrency}/{slow}'] = self.bench_level(
+                        port, concurrency, slow, options)
+            return results
+        finally:
+            server.terminate()
+            server.wait()
+
+    def wait_ready(self, mode, port):
+        deadline = time.monotonic() + READY_TIMEOUT
+        while time.monotonic() < deadline:
+            try:
+                with urlopen(f'http://127.0.0.1:{port}{READY_PATH}') as page:
+                    page.read()
+                return
+            except (URLError, ConnectionError):
+                time.sleep(0.2)
+        raise CommandError(SERVER_FAILED.format(
+            mode=mode, timeout=READY_TIMEOUT))
+
+    def bench_level(self, port, concurrency, slow, options):
+        stop = threading.Event()
+        clients = [
+            threading.Thread(target=slow_client, args=(port, stop))
+            for _ in range(slow)]
+        for client in clients:
+            client.start()
+        with tempfile.TemporaryDirectory() as directory:
+            output = Path(directory) / 'bench.json'
+            try:
+                call_command(
+                    'bench_api',
+                    url=f'http://127.0.0.1:{port}',
+                    concurrency=concurrency,
+                    requests=options['requests'],
+                    warmup=options['warmup'],
+                    endpoints=options['endpoints'],
+                    users=options['users'],
+                    recipes=options['recipes'],
+                    keep=True,
+                    output=str(output),
+                    stderr=StringIO())
+            finally:
+                stop.set()
+                for client in clients:
+                    client.join()
+            endpoints = json.loads(output.read_text())['endpoints']
+        return {
+            name: {
+                key: result[key]
+                for key in ('p50', 'p95', 'p99', 'throughput', 'errors')}
+            for name, result in endpoints.items()}
@@ -0,0 +1,60 @@
+import base64
+import json
+import os
+import time
+import tracemalloc
+from io import BytesIO
+
+from django.core.management.base import BaseCommand
+from drf_extra_fields.fields import Base64ImageField
+from PIL import Image
+from rest_framework.parsers import JSONParser
+
+from api.fields import StreamingBase64ImageField
+
+MEGABYTE = 1024 * 1024
+PAYLOAD = 'Изображение {width}x{height}: {image:.1f} МБ, запрос {body:.1f} МБ'
+RESULT = '{name}: пик памяти {peak:.1f} МБ, {time:.0f} мс'
+
+
+class Command(BaseCommand):
+    help = 'Сравнение пикового потребления памяти при загрузке изображения'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--width', type=int, default=3000)
+        parser.add_argument('--height', type=int, default=2000)
+
+    def handle(self, *args, **options):
+        image = self.make_image(options['width'], options['height'])
+        body = json.dumps({
+            'image': 'data:image/jpeg;base64,'
+                     + base64.b64encode(image).decode()}).encode()
+        self.stdout.write(PAYLOAD.format(
+            width=options['width'],
+            height=options['height'],
+            image=len(image) / MEGABYTE,
+            body=len(body) / MEGABYTE))
+        for name, field in (
+            ('Base64ImageField', Base64ImageField()),
+            ('StreamingBase64ImageField', StreamingBase64ImageField()),
+        ):
+            self.measure(name, field, body)
+
+    def make_image(self, width, height):
+        buffer = BytesIO()
+        Image.frombytes(
+            'RGB', (width, height), os.urandom(width * height * 3)
+        ).save(buffer, 'JPEG', quality=90)
+        return buffer.getvalue()
+
+    def measure(self, name, field, body):
+        tracemalloc.start()
+        started = time.perf_counter()
+        data = JSONParser().parse(BytesIO(body))
+        file = field.to_internal_value(data.pop('image'))
+        elapsed = time.perf_counter() - started
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        file.close()
+        self.stdout.write(RESULT.format(
+            name=name, peak=peak / MEGABYTE, time=elapsed * 1000))
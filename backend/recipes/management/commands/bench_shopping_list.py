@@ -0,0 +1,98 @@
+import time
+import tracemalloc
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from rest_framework.test import APIRequestFactory, force_authenticate
+
+from api.views import RecipeViewSet
+from recipes.models import (FoodUser, Ingredient, Recipe, RecipeIngredient,
+                            ShoppingCart, ShoppingListItem)
+
+USERNAME = 'bench_shopping_list'
+RESULT = (
+    'Рецептов: {recipes}, продуктов: {ingredients}, размер: {size} байт\n'
+    'Первый байт: {first_byte:.1f} мс, всего: {total:.1f} мс, '
+    'пик памяти: {peak:.1f} КБ')
+
+
+class Rollback(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = 'Замер скачивания списка покупок на синтетической корзине'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--recipes', type=int, default=500)
+        parser.add_argument('--ingredients', type=int, default=10)
+        parser.add_argument('--format', default='pdf')
+
+    def handle(self, *args, **options):
+        try:
+            with transaction.atomic():
+                self.stdout.write(RESULT.format(**self.run(
+                    options['recipes'],
+                    options['ingredients'],
+                    options['format'])))
+                raise Rollback
+        except Rollback:
+            pass
+
+    def run(self, recipes_count, ingredients_count, document_format):
+        user = FoodUser.objects.create_user(
+            email=f'{USERNAME}@example.com',
+            username=USERNAME,
+            first_name=USERNAME,
+            last_name=USERNAME)
+        Ingredient.objects.bulk_create(
+            Ingredient(
+                name=f'{USERNAME} {index}',
+                measurement_unit='г')
+            for index in range(recipes_count * ingredients_count // 2))
+        ingredients = list(
+            Ingredient.objects.filter(name__startswith=USERNAME))
+        Recipe.objects.bulk_create(
+            Recipe(
+                author=user,
+                name=f'{USERNAME} {index}',
+                image='recipe_images/bench.png',
+                text=USERNAME,
+                cooking_time=1)
+            for index in range(recipes_count))
+        recipes = list(user.recipe.all())
+        RecipeIngredient.objects.bulk_create(
+            RecipeIngredient(
+                recipe=recipe,
+                ingredient=ingredients[
+                    (index * ingredients_count + shift) % len(ingredients)],
+                amount=shift + 1)
+            for index, recipe in enumerate(recipes)
+            for shift in range(ingredients_count))
+        ShoppingCart.objects.bulk_create(
+            ShoppingCart(user=user, recipe=recipe) for recipe in recipes)
+        for recipe in recipes:
+            ShoppingListItem.add_recipe(user.id, recipe.id)
+        request = APIRequestFactory().get(
+            '/api/recipes/download_shopping_cart/',
+            {'format': document_format})
+        force_authenticate(request, user=user)
+        view = RecipeViewSet.as_view(
+            {'get': 'download_shopping_cart'},
+            **RecipeViewSet.download_shopping_cart.kwargs)
+        tracemalloc.start()
+        started = time.perf_counter()
+        chunks = iter(view(request).streaming_content)
+        size = len(next(chunks))
+        first_byte = time.perf_counter() - started
+        size += sum(len(chunk) for chunk in chunks)
+        total = time.perf_counter() - started
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+        return {
+            'recipes': recipes_count,
+            'ingredients': user.shopping_list.count(),
+            'size': size,
+            'first_byte': first_byte * 1000,
+            'total': total * 1000,
+            'peak': peak / 1024}
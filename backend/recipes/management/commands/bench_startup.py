@@ -0,0 +1,148 @@
+import json
+import os
+import subprocess
+import sys
+import time
+from pathlib import Path
+from urllib.error import URLError
+from urllib.request import urlopen
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+IMPORT_SCRIPT = '''
+import resource, time
+started = time.perf_counter()
+import django
+django.setup()
+from django.urls import get_resolver
+get_resolver().url_patterns
+print(time.perf_counter() - started,
+      resource.getrusage(resource.RUSAGE_SELF).ru_maxrss)
+'''
+READY_PATH = '/api/tags/'
+READY_TIMEOUT = 60
+SETTLE_TIME = 2
+
+IMPORT_FAILED = 'Не удалось импортировать приложение: {}'
+SERVER_FAILED = 'gunicorn не запустился за {} с'
+RUNNING = 'gunicorn, preload_app={preload}: {workers} процессов'
+SAVED = 'Результаты сохранены в {}'
+
+
+def get_children(pid):
+    children = []
+    for stat in Path('/proc').glob('[0-9]*/stat'):
+        try:
+            fields = stat.read_text().rsplit(')', 1)[1].split()
+        except OSError:
+            continue
+        if int(fields[1]) == pid:
+            children.append(int(stat.parent.name))
+    return children
+
+
+def get_pss(pid):
+    try:
+        rollup = Path(f'/proc/{pid}/smaps_rollup').read_text()
+    except OSError:
+        return None
+    for line in rollup.splitlines():
+        if line.startswith('Pss:'):
+            return int(line.split()[1]) / 1024
+    return None
+
+
+class Command(BaseCommand):
+    help = (
+        'Замер запуска: импорт Django-приложения и старт gunicorn '
+        'с preload_app и без, память воркеров')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--repeat', type=int, default=5)
+        parser.add_argument('--workers', type=int, default=4)
+        parser.add_argument('--worker-class', default='sync')
+        parser.add_argument('--port', type=int, default=8101)
+        parser.add_argument('--output', help='JSON файл для результатов')
+
+    def handle(self, *args, **options):
+        self.env = {
+            **os.environ,
+            'DJANGO_SETTINGS_MODULE': settings.SETTINGS_MODULE,
+            'PYTHONPATH': os.pathsep.join(sys.path)}
+        report = {
+            'import': self.bench_import(options['repeat']),
+            'gunicorn': {
+                f'preload_app={preload}': self.bench_gunicorn(
+                    preload, options)
+                for preload in (False, True)}}
+        content = json.dumps(report, ensure_ascii=False, indent=2)
+        if options['output']:
+            with open(options['output'], 'w', encoding='utf-8') as file:
+                file.write(content)
+            self.stderr.write(SAVED.format(options['output']))
+        else:
+            self.stdout.write(content)
+
+    def bench_import(self, repeat):
+        durations, peaks = [], []
+        for _ in range(repeat):
+            result = subprocess.run(
+                (sys.executable, '-c', IMPORT_SCRIPT),
+                cwd=settings.BASE_DIR, env=self.env,
+                capture_output=True, text=True)
+            if result.returncode:
+                raise CommandError(IMPORT_FAILED.format(result.stderr))
+            duration, peak = result.stdout.split()
+            durations.append(float(duration) * 1000)
+            peaks.append(int(peak) / 1024)
+        return {
+            'min_ms': round(min(durations), 1),
+            'mean_ms': round(sum(durations) / len(durations), 1),
+            'max_rss_mb': round(max(peaks), 1)}
+
+    def bench_gunicorn(self, preload, options):
+        self.stderr.write(RUNNING.format(
+            preload=preload, workers=options['workers']))
+        started = time.perf_counter()
+        server = subprocess.Popen(
+            (sys.executable, '-m', 'gunicorn',
+             '-c', 'python:foodgram_project.gunicorn'),
+            cwd=settings.BASE_DIR,
+            env={
+                **self.env,
+                'GUNICORN_BIND': f'127.0.0.1:{options["port"]}',
+                'GUNICORN_WORKERS': str(options['workers']),
+                'GUNICORN_WORKER_CLASS': options['worker_class'],
+                'GUNICORN_PRELOAD': str(preload)},
+            stdout=subprocess.DEVNULL,
+            stderr=subprocess.DEVNULL)
+        try:
+            ready = self.wait_ready(server, options['port']) - started
+            while len(get_children(server.pid)) < options['workers']:
+                time.sleep(0.1)
+            time.sleep(SETTLE_TIME)
+            workers = [
+                get_pss(pid) for pid in get_children(server.pid)]
+            master = get_pss(server.pid)
+        finally:
+            server.terminate()
+            server.wait()
+        result = {'ready_ms': round(ready * 1000, 1)}
+        if master is not None and None not in workers:
+            result.update(
+                master_pss_mb=round(master, 1),
+                worker_pss_mb=round(sum(workers) / len(workers), 1),
+                total_pss_mb=round(master + sum(workers), 1))
+        return result
+
+    def wait_ready(self, server, port):
+        deadline = time.monotonic() + READY_TIMEOUT
+        while time.monotonic() < deadline and server.poll() is None:
+            try:
+                with urlopen(f'http://127.0.0.1:{port}{READY_PATH}') as page:
+                    page.read()
+                return time.perf_counter()
+            except (URLError, ConnectionError):
+                time.sleep(0.05)
+        raise CommandError(SERVER_FAILED.format(READY_TIMEOUT))
@@ -0,0 +1,82 @@
+import random
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from recipes.models import FoodUser, Recipe, Tag
+
+USERNAME = 'bench_tag_filter'
+BATCH_SIZE = 5000
+RESULT = '{name}: найдено {count}, страница {page}, {time:.1f} мс'
+
+
+class Command(BaseCommand):
+    help = 'Сравнение фильтра по тегам через JOIN и через маску тегов'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--recipes', type=int, default=100000)
+        parser.add_argument('--tags', type=int, default=8)
+        parser.add_argument('--selected', type=int, default=3)
+        parser.add_argument('--repeat', type=int, default=5)
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            selected = self.populate(
+                options['recipes'], options['tags'])[:options['selected']]
+            slugs = [tag.slug for tag in selected]
+            for name, queryset in (
+                ('JOIN', Recipe.objects.filter(tags__slug__in=slugs)),
+                ('JOIN DISTINCT', Recipe.objects.filter(
+                    tags__slug__in=slugs).distinct()),
+                ('Маска', Recipe.objects.with_any_tag(selected)),
+            ):
+                self.measure(name, queryset, options['repeat'])
+            transaction.set_rollback(True)
+
+    def populate(self, recipes_count, tags_count):
+        author = FoodUser.objects.create_user(
+            email=f'{USERNAME}@example.com',
+            username=USERNAME,
+            first_name=USERNAME,
+            last_name=USERNAME)
+        tags = [
+            Tag.objects.create(
+                name=f'{USERNAME} {index}',
+                color='#000000',
+                slug=f'{USERNAME}_{index}')
+            for index in range(tags_count)]
+        random.seed(recipes_count)
+        recipe_tags = [
+            random.sample(tags, random.randint(1, 3))
+            for _ in range(recipes_count)]
+        Recipe.objects.bulk_create(
+            (Recipe(
+                author=author,
+                name=f'{USERNAME} {index}',
+                image='recipe_images/bench.png',
+                text=USERNAME,
+                cooking_time=1,
+                tags_mask=Tag.get_mask(recipe_tags[index]))
+                for index in range(recipes_count)),
+            batch_size=BATCH_SIZE)
+        Recipe.tags.through.objects.bulk_create(
+            (Recipe.tags.through(recipe_id=recipe_id, tag_id=tag.id)
+                for recipe_id, tags in zip(
+                    author.recipe.order_by('id').values_list(
+                        'id', flat=True),
+                    recipe_tags)
+                for tag in tags),
+            batch_size=BATCH_SIZE)
+        return tags
+
+    def measure(self, name, queryset, repeat):
+        started = time.perf_counter()
+        for _ in range(repeat):
+            count = queryset.count()
+            page = len(list(queryset.order_by('-pub_date', '-id')[:6]))
+        self.stdout.write(RESULT.format(
+            name=name,
+            count=count,
+            page=page,
+            time=(time.perf_counter() - started) * 1000 / repeat))
@@ -0,0 +1,79 @@
+import os
+import subprocess
+import sys
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from foodgram_project.settings import STARTUP_IMPORT_BUDGET
+
+IMPORT_SCRIPT = '''
+import time
+started = time.perf_counter()
+import django
+django.setup()
+from django.urls import get_resolver
+get_resolver().url_patterns
+print(time.perf_counter() - started)
+'''
+LAZY_MODULES = ('reportlab',)
+MICROSECONDS = 1000
+
+IMPORT_FAILED = 'Не удалось импортировать приложение: {}'
+SLOWEST = '{time:8.1f} мс  {module}'
+TOTAL = 'Импорт приложения: {time:.1f} мс, бюджет {budget} мс'
+OVER_BUDGET = 'Импорт приложения занимает {time:.1f} мс, бюджет {budget} мс'
+EAGER_IMPORT = 'При запуске импортируются модули: {}'
+
+
+def parse_import_time(stderr):
+    modules, top_level = set(), {}
+    for line in stderr.splitlines():
+        if not line.startswith('import time:'):
+            continue
+        _, cumulative, module = line[len('import time:'):].split('|')
+        if not cumulative.strip().isdigit():
+            continue
+        modules.add(module.strip())
+        if module == f' {module.strip()}':
+            top_level[module.strip()] = int(cumulative) / MICROSECONDS
+    return modules, top_level
+
+
+class Command(BaseCommand):
+    help = (
+        'Проверка времени импорта Django-приложения по python -X '
+        'importtime: бюджет и отсутствие тяжелых модулей, нужных только '
+        'при выгрузке PDF')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--budget', type=int, default=STARTUP_IMPORT_BUDGET,
+            help='Допустимое время импорта, мс')
+        parser.add_argument('--top', type=int, default=15)
+
+    def handle(self, *args, **options):
+        result = subprocess.run(
+            (sys.executable, '-X', 'importtime', '-c', IMPORT_SCRIPT),
+            cwd=settings.BASE_DIR,
+            env={
+                **os.environ,
+                'DJANGO_SETTINGS_MODULE': settings.SETTINGS_MODULE,
+                'PYTHONPATH': os.pathsep.join(sys.path)},
+            capture_output=True, text=True)
+        if result.returncode:
+            raise CommandError(IMPORT_FAILED.format(result.stderr))
+        modules, top_level = parse_import_time(result.stderr)
+        for module, time in sorted(
+                top_level.items(), key=lambda item: -item[1])[:options['top']]:
+            self.stdout.write(SLOWEST.format(time=time, module=module))
+        total = float(result.stdout) * MICROSECONDS
+        budget = options['budget']
+        self.stdout.write(TOTAL.format(time=total, budget=budget))
+        eager = [
+            module for module in LAZY_MODULES
+            if any(name.split('.')[0] == module for name in modules)]
+        if eager:
+            raise CommandError(EAGER_IMPORT.format(', '.join(eager)))
+        if total > budget:
+            raise CommandError(OVER_BUDGET.format(time=total, budget=budget))
@@ -0,0 +1,90 @@
+import shutil
+import time
+from collections import defaultdict
+from pathlib import Path, PurePosixPath
+
+from django.core.management.base import BaseCommand
+
+from recipes.archive import IMAGES_DIR, RECIPES_FILE, TAGS_FILE, write_line
+from recipes.models import Recipe, RecipeIngredient, Tag
+
+IMAGE_NOT_FOUND = 'Рецепт {}: не найдено изображение {}'
+PROGRESS = 'Выгружено {count} рецептов, {rate:.0f} рецептов/с'
+SUCCESS = 'Выгружено {count} рецептов в {path} за {time:.1f} с'
+
+
+class Command(BaseCommand):
+    help = 'Выгрузка рецептов с тегами, продуктами и изображениями в архив'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='Каталог архива')
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        directory = Path(options['path'])
+        (directory / IMAGES_DIR).mkdir(parents=True, exist_ok=True)
+        with open(directory / TAGS_FILE, 'w', encoding='utf-8') as file:
+            for tag in Tag.objects.order_by('id').values(
+                    'name', 'color', 'slug'):
+                write_line(file, tag)
+        started = time.perf_counter()
+        count = 0
+        last_id = 0
+        with open(directory / RECIPES_FILE, 'w', encoding='utf-8') as file:
+            while recipes := list(Recipe.objects.filter(
+                id__gt=last_id
+            ).select_related('author').only(
+                'name', 'text', 'cooking_time', 'pub_date', 'image',
+                'author__email'
+            ).order_by('id')[:options['batch_size']]):
+                last_id = recipes[-1].id
+                self.write_recipes(file, directory, recipes)
+                count += len(recipes)
+                self.stdout.write(PROGRESS.format(
+                    count=count,
+                    rate=count / (time.perf_counter() - started)))
+        self.stdout.write(SUCCESS.format(
+            count=count,
+            path=directory,
+            time=time.perf_counter() - started))
+
+    def write_recipes(self, file, directory, recipes):
+        ids = [recipe.id for recipe in recipes]
+        tags = defaultdict(list)
+        for recipe_id, slug in Recipe.tags.through.objects.filter(
+            recipe_id__in=ids
+        ).order_by('tag_id').values_list('recipe_id', 'tag__slug'):
+            tags[recipe_id].append(slug)
+        ingredients = defaultdict(list)
+        for recipe_id, name, unit, amount in RecipeIngredient.objects.filter(
+            recipe_id__in=ids
+        ).order_by('id').values_list(
+            'recipe_id', 'ingredient__name', 'ingredient__measurement_unit',
+            'amount'
+        ):
+            ingredients[recipe_id].append({
+                'name': name, 'measurement_unit': unit, 'amount': amount})
+        for recipe in recipes:
+            write_line(file, {
+                'author': recipe.author.email,
+                'name': recipe.name,
+                'text': recipe.text,
+                'cooking_time': recipe.cooking_time,
+                'pub_date': recipe.pub_date.isoformat(),
+                'image': self.copy_image(recipe, directory),
+                'tags': tags[recipe.id],
+                'ingredients': ingredients[recipe.id]})
+
+    def copy_image(self, recipe, directory):
+        if not recipe.image:
+            return None
+        name = f'{IMAGES_DIR}/{PurePosixPath(recipe.image.name).name}'
+        try:
+            with recipe.image.open('rb') as source, open(
+                    directory / name, 'wb') as target:
+                shutil.copyfileobj(source, target)
+        except FileNotFoundError:
+            self.stderr.write(IMAGE_NOT_FOUND.format(
+                recipe.id, recipe.image.name))
+            return None
+        return name
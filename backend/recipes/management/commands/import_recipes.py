@@ -0,0 +1,205 @@
+import json
+import time
+from collections import Counter
+from itertools import islice
+from pathlib import Path, PurePosixPath
+
+from django.core.exceptions import ValidationError
+from django.core.files import File
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.utils.dateparse import parse_datetime
+
+from recipes.archive import RECIPES_FILE, TAGS_FILE
+from recipes.models import (FoodUser, Ingredient, Recipe, RecipeIngredient,
+                            ReferenceVersion, Tag)
+
+FILE_NOT_FOUND = 'Не найден файл {}'
+INVALID_RECIPE = 'Запись {}: {}'
+NO_AUTHOR = 'нет пользователя {}'
+NO_TAG = 'нет тега {}'
+NO_IMAGE = 'нет изображения {}'
+MISSING_FIELDS = 'нет полей {}'
+PROGRESS = 'Обработано {rows} рецептов, {rate:.0f} рецептов/с'
+RESULT = (
+    'Добавлено: {inserted}, пропущено: {skipped}, с ошибками: {invalid}. '
+    '{rows} рецептов за {time:.1f} с, {rate:.0f} рецептов/с')
+RECIPE_FIELDS = (
+    'author', 'name', 'text', 'cooking_time', 'pub_date', 'image', 'tags',
+    'ingredients')
+
+
+class Command(BaseCommand):
+    help = 'Загрузка рецептов из архива, созданного export_recipes'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='Каталог архива')
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        self.directory = Path(options['path'])
+        for name in (TAGS_FILE, RECIPES_FILE):
+            if not (self.directory / name).is_file():
+                raise CommandError(FILE_NOT_FOUND.format(
+                    self.directory / name))
+        self.stats = Counter()
+        self.tags = self.import_tags()
+        started = time.perf_counter()
+        with open(
+                self.directory / RECIPES_FILE, encoding='utf-8') as file:
+            lines = enumerate(file, 1)
+            while batch := list(islice(lines, options['batch_size'])):
+                self.import_batch(batch)
+                self.stats['rows'] += len(batch)
+                self.stdout.write(PROGRESS.format(
+                    rows=self.stats['rows'],
+                    rate=self.stats['rows'] / (
+                        time.perf_counter() - started)))
+        elapsed = time.perf_counter() - started
+        self.stdout.write(RESULT.format(
+            time=elapsed,
+            rate=self.stats['rows'] / elapsed if elapsed else 0,
+            **{name: self.stats[name] for name in (
+                'inserted', 'skipped', 'invalid', 'rows')}))
+
+    @transaction.atomic
+    def import_tags(self):
+        with open(self.directory / TAGS_FILE, encoding='utf-8') as file:
+            archived = [json.loads(line) for line in file if line.strip()]
+        tags = Tag.objects.in_bulk(
+            [tag['slug'] for tag in archived], field_name='slug')
+        new = [
+            Tag(name=tag['name'], color=tag['color'], slug=tag['slug'])
+            for tag in archived if tag['slug'] not in tags]
+        if new:
+            try:
+                bits = Tag.get_free_bits(len(new))
+            except ValidationError as error:
+                raise CommandError(error.message)
+            for tag, bit in zip(new, bits):
+                tag.bit = bit
+            Tag.objects.bulk_create(new)
+            ReferenceVersion.bump(Tag)
+        return Tag.objects.in_bulk(field_name='slug')
+
+    def parse_batch(self, batch):
+        items = []
+        for line, text in batch:
+            if not text.strip():
+                continue
+            try:
+                item = json.loads(text)
+            except json.JSONDecodeError as error:
+                self.report_invalid(line, error)
+                continue
+            missing = [field for field in RECIPE_FIELDS if field not in item]
+            if missing:
+                self.report_invalid(line, MISSING_FIELDS.format(missing))
+                continue
+            items.append((line, item))
+        return items
+
+    def report_invalid(self, line, error):
+        self.stats['invalid'] += 1
+        self.stderr.write(INVALID_RECIPE.format(line, error))
+
+    def get_ingredients(self, items):
+        keys = {
+            (ingredient['name'], ingredient['measurement_unit'])
+            for _, item in items for ingredient in item['ingredients']}
+        names = {name for name, _ in keys}
+        ingredients = {
+            (ingredient.name, ingredient.measurement_unit): ingredient.id
+            for ingredient in Ingredient.objects.filter(name__in=names)}
+        new = [
+            Ingredient(name=name, measurement_unit=unit)
+            for name, unit in keys - ingredients.keys()]
+        if new:
+            Ingredient.objects.bulk_create(new, ignore_conflicts=True)
+            ReferenceVersion.bump(Ingredient)
+            ingredients = {
+                (ingredient.name, ingredient.measurement_unit):
+                    ingredient.id
+                for ingredient in Ingredient.objects.filter(name__in=names)}
+        return ingredients
+
+    def check_item(self, item, authors):
+        if item['author'] not in authors:
+            return NO_AUTHOR.format(item['author'])
+        for slug in item['tags']:
+            if slug not in self.tags:
+                return NO_TAG.format(slug)
+        if not item['image'] or not (
+                self.directory / item['image']).is_file():
+            return NO_IMAGE.format(item['image'])
+        return None
+
+    def save_image(self, recipe, name):
+        with open(self.directory / name, 'rb') as file:
+            recipe.image.save(
+                PurePosixPath(name).name, File(file), save=False)
+
+    def create_recipes(self, recipes):
+        if connection.features.can_return_rows_from_bulk_insert:
+            Recipe.objects.bulk_create(recipes)
+            return
+        for recipe in recipes:
+            recipe.save()
+
+    @transaction.atomic
+    def import_batch(self, batch):
+        items = self.parse_batch(batch)
+        authors = FoodUser.objects.in_bulk(
+            {item['author'] for _, item in items}, field_name='email')
+        existing = set(Recipe.objects.filter(
+            author__email__in=authors,
+            name__in={item['name'] for _, item in items},
+        ).values_list('author__email', 'name'))
+        valid = []
+        for line, item in items:
+            error = self.check_item(item, authors)
+            if error:
+                self.report_invalid(line, error)
+                continue
+            key = (item['author'], item['name'])
+            if key in existing:
+                self.stats['skipped'] += 1
+                continue
+            existing.add(key)
+            valid.append((line, item))
+        ingredients = self.get_ingredients(valid)
+        recipes = []
+        for _, item in valid:
+            recipe = Recipe(
+                author=authors[item['author']],
+                name=item['name'],
+                text=item['text'],
+                cooking_time=item['cooking_time'],
+                tags_mask=Tag.get_mask(
+                    self.tags[slug] for slug in item['tags']))
+            self.save_image(recipe, item['image'])
+            recipes.append(recipe)
+        self.create_recipes(recipes)
+        for recipe, (_, item) in zip(recipes, valid):
+            recipe.pub_date = parse_datetime(item['pub_date'])
+        Recipe.objects.bulk_update(recipes, ('pub_date',))
+        Recipe.tags.through.objects.bulk_create(
+            Recipe.tags.through(
+                recipe_id=recipe.id, tag_id=self.tags[slug].id)
+            for recipe, (_, item) in zip(recipes, valid)
+            for slug in set(item['tags']))
+        RecipeIngredient.objects.bulk_create(
+            RecipeIngredient(
+                recipe_id=recipe.id,
+                ingredient_id=ingredients[(
+                    ingredient['name'], ingredient['measurement_unit'])],
+                amount=ingredient['amount'])
+            for recipe, (_, item) in zip(recipes, valid)
+            for ingredient in item['ingredients'])
+        for author_id, count in Counter(
+                recipe.author_id for recipe in recipes).items():
+            FoodUser.objects.filter(pk=author_id).change_counter(
+                'recipes_count', count)
+        if recipes:
+            ReferenceVersion.bump(Recipe)
+        self.stats['inserted'] += len(recipes)
@@ -0,0 +1,188 @@
+import csv
+import json
+import time
+from collections import Counter, namedtuple
+from itertools import islice
+from pathlib import Path
+
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from recipes.models import Ingredient, Recipe, ReferenceVersion, Tag
+
+ImportSpec = namedtuple('ImportSpec', ('model', 'fields', 'key'))
+IMPORTS = {
+    'ingredients': ImportSpec(
+        Ingredient,
+        ('name', 'measurement_unit'),
+        ('name', 'measurement_unit')),
+    'tags': ImportSpec(Tag, ('name', 'color', 'slug'), ('slug',)),
+}
+FORMATS = ('csv', 'json')
+READ_SIZE = 64 * 1024
+JSON_SEPARATORS = ' \t\r\n[],'
+
+FILE_NOT_FOUND = 'Не найден файл {}'
+INVALID_JSON = 'Некорректный JSON в конце файла: {}'
+INVALID_ROW = 'Запись {}: {}'
+INSERT = '+ {}'
+UPDATE = '~ {}: {}'
+CHANGE = '{} {!r} -> {!r}'
+PROGRESS = 'Обработано {rows} записей, {rate:.0f} записей/с'
+RESULT = (
+    'Добавлено: {inserted}, обновлено: {updated}, пропущено: {skipped}, '
+    'с ошибками: {invalid}. {rows} записей за {time:.1f} с, '
+    '{rate:.0f} записей/с')
+DRY_RUN = 'Пробный запуск, база не изменена'
+
+
+def read_json(file):
+    decoder = json.JSONDecoder()
+    buffer = ''
+    position = 0
+    for chunk in iter(lambda: file.read(READ_SIZE), ''):
+        buffer = buffer[position:] + chunk
+        position = 0
+        while True:
+            while (position < len(buffer)
+                   and buffer[position] in JSON_SEPARATORS):
+                position += 1
+            try:
+                item, position = decoder.raw_decode(buffer, position)
+            except json.JSONDecodeError:
+                break
+            yield item
+    if buffer[position:].strip(JSON_SEPARATORS):
+        raise CommandError(INVALID_JSON.format(buffer[position:][:100]))
+
+
+def read_csv(file, fields):
+    for row in csv.reader(file):
+        if row and tuple(row) != fields:
+            yield dict(zip(fields, row))
+
+
+class Command(BaseCommand):
+    help = 'Загрузка или обновление справочника продуктов или тегов'
+
+    def add_arguments(self, parser):
+        parser.add_argument('reference', choices=IMPORTS)
+        parser.add_argument(
+            '--file',
+            help='CSV или JSON файл, по умолчанию data/<справочник>.json')
+        parser.add_argument(
+            '--format',
+            choices=FORMATS,
+            help='Формат файла, по умолчанию по расширению')
+        parser.add_argument('--batch-size', type=int, default=1000)
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Показать изменения, не записывая их в базу')
+
+    def handle(self, *args, **options):
+        spec = IMPORTS[options['reference']]
+        path = Path(
+            options['file']
+            or settings.CSVDATA_ROOT / f'{options["reference"]}.json')
+        if not path.is_file():
+            raise CommandError(FILE_NOT_FOUND.format(path))
+        document_format = options['format'] or (
+            'csv' if path.suffix.lower() == '.csv' else 'json')
+        self.dry_run = options['dry_run']
+        self.stats = Counter()
+        started = time.perf_counter()
+        with open(path, encoding='utf-8', newline='') as file:
+            items = enumerate(
+                read_csv(file, spec.fields) if document_format == 'csv'
+                else read_json(file), 1)
+            while batch := list(islice(items, options['batch_size'])):
+                self.import_batch(spec, batch)
+                self.stats['rows'] += len(batch)
+                self.stdout.write(PROGRESS.format(
+                    rows=self.stats['rows'],
+                    rate=self.stats['rows'] / (
+                        time.perf_counter() - started)))
+        elapsed = time.perf_counter() - started
+        if not self.dry_run and (
+                self.stats['inserted'] or self.stats['updated']):
+            ReferenceVersion.bump(spec.model)
+        self.stdout.write(RESULT.format(
+            time=elapsed,
+            rate=self.stats['rows'] / elapsed if elapsed else 0,
+            **{name: self.stats[name] for name in (
+                'inserted', 'updated', 'skipped', 'invalid', 'rows')}))
+        if self.dry_run:
+            self.stdout.write(DRY_RUN)
+
+    def get_key(self, spec, instance):
+        return tuple(getattr(instance, field) for field in spec.key)
+
+    def clean_batch(self, spec, batch):
+        exclude = [
+            field.name for field in spec.model._meta.fields
+            if field.name not in spec.fields]
+        items = {}
+        for line, values in batch:
+            try:
+                instance = spec.model(
+                    **{field: values.get(field) for field in spec.fields})
+                instance.clean_fields(exclude=exclude)
+            except (AttributeError, ValidationError) as error:
+                self.stats['invalid'] += 1
+                self.stderr.write(INVALID_ROW.format(line, error))
+                continue
+            key = self.get_key(spec, instance)
+            if key in items:
+                self.stats['skipped'] += 1
+            items[key] = instance
+        return items
+
+    @transaction.atomic
+    def import_batch(self, spec, batch):
+        items = self.clean_batch(spec, batch)
+        existing = {
+            self.get_key(spec, instance): instance
+            for instance in spec.model.objects.select_for_update().filter(
+                **{f'{spec.key[0]}__in': {key[0] for key in items}})}
+        new, changed = [], []
+        for key, instance in items.items():
+            current = existing.get(key)
+            if current is None:
+                new.append(instance)
+                if self.dry_run:
+                    self.stdout.write(INSERT.format(instance))
+                continue
+            changes = [
+                CHANGE.format(
+                    field, getattr(current, field), getattr(instance, field))
+                for field in spec.fields
+                if getattr(current, field) != getattr(instance, field)]
+            if not changes:
+                self.stats['skipped'] += 1
+                continue
+            for field in spec.fields:
+                setattr(current, field, getattr(instance, field))
+            changed.append(current)
+            if self.dry_run:
+                self.stdout.write(UPDATE.format(current, ', '.join(changes)))
+        self.stats['inserted'] += len(new)
+        self.stats['updated'] += len(changed)
+        if self.dry_run:
+            return
+        if spec.model is Tag:
+            try:
+                bits = Tag.get_free_bits(len(new))
+            except ValidationError as error:
+                raise CommandError(error.message)
+            for tag, bit in zip(new, bits):
+                tag.bit = bit
+        spec.model.objects.bulk_create(new)
+        update_fields = [
+            field for field in spec.fields if field not in spec.key]
+        if changed and update_fields:
+            spec.model.objects.bulk_update(changed, update_fields)
+            if spec.model is Tag:
+                Recipe.objects.filter(tags__in=changed).touch()
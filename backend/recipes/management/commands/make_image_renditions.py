@@ -0,0 +1,32 @@
+from django.core.management.base import BaseCommand
+
+from recipes.images import make_renditions
+from recipes.models import Recipe
+
+SUCCESS = 'Подготовлены изображения для {} рецептов'
+FAILED = 'Рецепт {}: {}'
+
+
+class Command(BaseCommand):
+    help = 'Подготовка уменьшенных изображений рецептов'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--all',
+            action='store_true',
+            help='Пересоздать изображения и для уже готовых рецептов')
+
+    def handle(self, *args, **options):
+        recipes = Recipe.objects.exclude(image='')
+        if not options['all']:
+            recipes = recipes.filter(image_renditions={})
+        count = 0
+        for recipe_id, image_name in recipes.values_list(
+                'id', 'image').iterator():
+            try:
+                make_renditions(recipe_id, image_name)
+            except (OSError, ValueError) as error:
+                self.stderr.write(FAILED.format(recipe_id, error))
+                continue
+            count += 1
+        self.stdout.write(SUCCESS.format(count))
@@ -0,0 +1,50 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from recipes.models import ShoppingListItem
+
+MISMATCH = 'Пользователь {}, продукт {}: в таблице {}, в корзине {}'
+VERIFY_FAILED = 'Списки покупок расходятся с корзинами: {} записей'
+VERIFY_SUCCESS = 'Списки покупок совпадают с корзинами'
+SUCCESS = 'Списки покупок пересобраны: {} записей'
+BATCH_SIZE = 1000
+
+
+class Command(BaseCommand):
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--verify',
+            action='store_true',
+            help='Только сравнить таблицу с корзинами, не изменяя её')
+
+    def handle(self, *args, **options):
+        live = ShoppingListItem.get_live_amounts()
+        if options['verify']:
+            stored = dict(
+                ((user_id, ingredient_id), amount)
+                for user_id, ingredient_id, amount
+                in ShoppingListItem.objects.values_list(
+                    'user_id', 'ingredient_id', 'amount').iterator())
+            mismatches = [
+                key for key in live.keys() | stored.keys()
+                if live.get(key) != stored.get(key)]
+            for user_id, ingredient_id in sorted(mismatches):
+                self.stdout.write(MISMATCH.format(
+                    user_id, ingredient_id,
+                    stored.get((user_id, ingredient_id)),
+                    live.get((user_id, ingredient_id))))
+            if mismatches:
+                raise CommandError(VERIFY_FAILED.format(len(mismatches)))
+            self.stdout.write(VERIFY_SUCCESS)
+            return
+        with transaction.atomic():
+            ShoppingListItem.objects.all().delete()
+            ShoppingListItem.objects.bulk_create(
+                (ShoppingListItem(
+                    user_id=user_id,
+                    ingredient_id=ingredient_id,
+                    amount=amount)
+                    for (user_id, ingredient_id), amount in live.items()),
+                batch_size=BATCH_SIZE)
+        self.stdout.write(SUCCESS.format(len(live)))
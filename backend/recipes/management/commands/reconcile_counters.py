@@ -0,0 +1,64 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.db.models import Count, F, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+from recipes.models import (Favorite, FoodUser, Recipe, ShoppingCart,
+                            Subscription)
+
+COUNTERS = (
+    (Recipe, 'favorites_count', Favorite, 'recipe'),
+    (Recipe, 'shoppingcarts_count', ShoppingCart, 'recipe'),
+    (FoodUser, 'recipes_count', Recipe, 'author'),
+    (FoodUser, 'follower_count', Subscription, 'user'),
+    (FoodUser, 'following_count', Subscription, 'author'),
+)
+MISMATCH = '{} {}, {}: сохранено {}, на самом деле {}'
+VERIFY_FAILED = 'Счётчики расходятся с данными: {} записей'
+VERIFY_SUCCESS = 'Счётчики совпадают с данными'
+SUCCESS = 'Счётчики исправлены: {} записей'
+BATCH_SIZE = 1000
+
+
+def get_live_count(related_model, field):
+    return Coalesce(Subquery(related_model.objects.filter(
+        **{field: OuterRef('pk')}
+    ).order_by().values(field).annotate(
+        count=Count('pk')).values('count')), 0)
+
+
+class Command(BaseCommand):
+    help = 'Сверка и исправление счётчиков рецептов и пользователей'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--verify',
+            action='store_true',
+            help='Только сравнить счётчики с данными, не изменяя их')
+
+    def handle(self, *args, **options):
+        fixed = 0
+        with transaction.atomic():
+            for model, counter, related_model, field in COUNTERS:
+                mismatches = list(model.objects.select_for_update().annotate(
+                    live_count=get_live_count(related_model, field)
+                ).exclude(
+                    **{counter: F('live_count')}
+                ).order_by('pk').values_list('pk', counter, 'live_count'))
+                for pk, stored, live in mismatches:
+                    self.stdout.write(MISMATCH.format(
+                        model._meta.verbose_name, pk, counter, stored, live))
+                fixed += len(mismatches)
+                if options['verify']:
+                    continue
+                model.objects.bulk_update(
+                    (model(pk=pk, **{counter: live})
+                     for pk, _, live in mismatches),
+                    (counter,),
+                    batch_size=BATCH_SIZE)
+        if options['verify']:
+            if fixed:
+                raise CommandError(VERIFY_FAILED.format(fixed))
+            self.stdout.write(VERIFY_SUCCESS)
+            return
+        self.stdout.write(SUCCESS.format(fixed))
@@ -0,0 +1,20 @@
+# Generated by Django 3.2 on 2026-10-18 17:30
+
+from django.db import migrations
+import recipes.models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0010_alter_recipe_options'),
+    ]
+
+    operations = [
+        migrations.AlterModelManagers(
+            name='fooduser',
+            managers=[
+                ('objects', recipes.models.FoodUserManager()),
+            ],
+        ),
+    ]
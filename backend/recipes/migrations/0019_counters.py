@@ -0,0 +1,62 @@
+# Generated by Django 3.2 on 2026-10-18 17:48
+
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+COUNTERS = (
+    ('Recipe', 'favorites_count', 'Favorite', 'recipe'),
+    ('Recipe', 'shoppingcarts_count', 'ShoppingCart', 'recipe'),
+    ('FoodUser', 'recipes_count', 'Recipe', 'author'),
+    ('FoodUser', 'follower_count', 'Subscription', 'user'),
+    ('FoodUser', 'following_count', 'Subscription', 'author'),
+)
+
+
+def fill_counters(apps, schema_editor):
+    for model_name, counter, related_name, field in COUNTERS:
+        related = apps.get_model('recipes', related_name).objects.filter(
+            **{field: OuterRef('pk')}
+        ).order_by().values(field).annotate(count=Count('pk')).values('count')
+        apps.get_model('recipes', model_name).objects.update(
+            **{counter: Coalesce(Subquery(related), 0)})
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0018_recipe_image_renditions'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='fooduser',
+            name='follower_count',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='подписки'),
+        ),
+        migrations.AddField(
+            model_name='fooduser',
+            name='following_count',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='подписчики'),
+        ),
+        migrations.AddField(
+            model_name='fooduser',
+            name='recipes_count',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='рецепты'),
+        ),
+        migrations.AddField(
+            model_name='recipe',
+            name='favorites_count',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='в избранных'),
+        ),
+        migrations.AddField(
+            model_name='recipe',
+            name='shoppingcarts_count',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='в корзинах'),
+        ),
+        migrations.AddIndex(
+            model_name='recipe',
+            index=models.Index(fields=['-favorites_count', '-pub_date', '-id'], name='recipe_popular'),
+        ),
+        migrations.RunPython(fill_counters, migrations.RunPython.noop),
+    ]
@@ -1,9 +1,16 @@
-from django.contrib.auth.models import AbstractUser
+from collections import Counter
+
+from django.contrib.auth.models import AbstractUser, UserManager
+from django.core.exceptions import EmptyResultSet, ValidationError
 from django.core.validators import MinValueValidator, RegexValidator
-from django.db import models
-from django.db.models import F, Sum
+from django.db import models, transaction
+from django.db.models import Exists, F, OuterRef, Sum, Value, Window
+from django.db.models.expressions import RawSQL
+from django.db.models.functions import Greatest, RowNumber
+from django.utils import timezone
 
 from foodgram_project.settings import LENGTHS
+from .cache import get_document_cache
 from .validators import validate_username
 
 NOT_UNIQUE_NAME = {'unique': "Это имя пользователя уже существует."}
@@ -16,8 +23,47 @@ COOK_ERROR = 'Минимальное значение = 1'
 AMOUNT_MIN = 1
 AMOUNT_ERROR = 'Минимальное значение = 1'
 
+TAG_BITS = 63
+TOO_MANY_TAGS = 'Тегов не может быть больше {}'
+
+
+class CounterQuerySet(models.QuerySet):
+
+    def change_counter(self, field, delta):
+        return self.update(**{field: Greatest(F(field) + delta, 0)})
+
+
+# Counters change only through change_counter, a full save of a loaded
+# instance must not write back its possibly stale values.
+class CounterMixin:
+    counter_fields = ()
+
+    def save(self, *args, update_fields=None, **kwargs):
+        if update_fields is None and not self._state.adding:
+            deferred = self.get_deferred_fields()
+            update_fields = [
+                field.name for field in self._meta.concrete_fields
+                if not field.primary_key
+                and field.name not in self.counter_fields
+                and field.attname not in deferred]
+        super().save(*args, update_fields=update_fields, **kwargs)
+
+
+class FoodUserQuerySet(CounterQuerySet):
 
-class FoodUser(AbstractUser):
+    def with_is_subscribed(self, user):
+        if user.is_anonymous:
+            return self.annotate(is_subscribed=Value(False))
+        return self.annotate(
+            is_subscribed=Exists(Subscription.objects.filter(
+                user=user, author=OuterRef('pk'))))
+
+
+class FoodUserManager(UserManager.from_queryset(FoodUserQuerySet)):
+    pass
+
+
+class FoodUser(CounterMixin, AbstractUser):
     USERNAME_FIELD = 'email'
     REQUIRED_FIELDS = ('username', 'first_name', 'last_name',)
     email = models.EmailField(
@@ -36,6 +82,21 @@ class FoodUser(AbstractUser):
     last_name = models.CharField(
         'фамилия',
         max_length=LENGTHS['LAST_NAME'])
+    recipes_count = models.PositiveIntegerField(
+        'рецепты',
+        default=0,
+        editable=False)
+    follower_count = models.PositiveIntegerField(
+        'подписки',
+        default=0,
+        editable=False)
+    following_count = models.PositiveIntegerField(
+        'подписчики',
+        default=0,
+        editable=False)
+
+    objects = FoodUserManager()
+    counter_fields = ('recipes_count', 'follower_count', 'following_count')
 
     class Meta:
         verbose_name = 'пользователь'
@@ -85,6 +146,10 @@ class Tag(models.Model):
         'тег',
         max_length=LENGTHS['TAG_SLUG'],
         unique=True)
+    bit = models.PositiveSmallIntegerField(
+        'бит в маске рецепта',
+        unique=True,
+        editable=False)
 
     class Meta:
         verbose_name = 'тег'
@@ -93,6 +158,26 @@ class Tag(models.Model):
     def __str__(self):
         return self.name
 
+    def save(self, *args, **kwargs):
+        if self.bit is None:
+            self.bit = Tag.get_free_bits(1)[0]
+        super().save(*args, **kwargs)
+
+    @staticmethod
+    def get_free_bits(count):
+        used = set(Tag.objects.values_list('bit', flat=True))
+        free = [bit for bit in range(TAG_BITS) if bit not in used][:count]
+        if len(free) < count:
+            raise ValidationError(TOO_MANY_TAGS.format(TAG_BITS))
+        return free
+
+    @staticmethod
+    def get_mask(tags):
+        mask = 0
+        for tag in tags:
+            mask |= 1 << tag.bit
+        return mask
+
 
 class Ingredient(models.Model):
     name = models.CharField(
@@ -116,7 +201,82 @@ class Ingredient(models.Model):
         return f'{self.name} ({self.measurement_unit})'
 
 
-class Recipe(models.Model):
+class ReferenceVersion(models.Model):
+    name = models.CharField(
+        'справочник',
+        max_length=LENGTHS['REFERENCE_NAME'],
+        unique=True)
+    version = models.PositiveIntegerField(
+        'версия',
+        default=0)
+    updated = models.DateTimeField(
+        'дата изменения',
+        auto_now=True)
+
+    class Meta:
+        verbose_name = 'версия справочника'
+        verbose_name_plural = 'версии справочников'
+
+    def __str__(self):
+        return f'{self.name}: {self.version}'
+
+    @staticmethod
+    def get_for_model(model):
+        return ReferenceVersion.objects.get_or_create(
+            name=model._meta.model_name)[0]
+
+    @staticmethod
+    def bump(model):
+        if not ReferenceVersion.objects.filter(
+            name=model._meta.model_name
+        ).update(version=F('version') + 1, updated=timezone.now()):
+            ReferenceVersion.objects.get_or_create(
+                name=model._meta.model_name, defaults={'version': 1})
+
+
+class RecipeQuerySet(CounterQuerySet):
+
+    def touch(self):
+        if self.update(updated=timezone.now()):
+            ReferenceVersion.bump(Recipe)
+
+    def limit_per_author(self, limit):
+        ranked = self.order_by().annotate(
+            recipe_rank=Window(
+                RowNumber(),
+                partition_by=F('author'),
+                order_by=F('pub_date').desc())
+        ).values('pk', 'recipe_rank')
+        try:
+            sql, params = ranked.query.sql_with_params()
+        except EmptyResultSet:
+            return self.none()
+        return self.model.objects.filter(pk__in=RawSQL(
+            f'SELECT ranked.id FROM ({sql}) ranked '
+            'WHERE ranked.recipe_rank <= %s',
+            (*params, limit)))
+
+    def with_any_tag(self, tags):
+        return self.alias(
+            tag_match=F('tags_mask').bitand(Tag.get_mask(tags))
+        ).exclude(tag_match=0)
+
+    def with_user_flags(self, user):
+        if user.is_anonymous:
+            return self.annotate(
+                is_favorited=Value(False),
+                is_in_shopping_cart=Value(False),
+                author_is_subscribed=Value(False))
+        return self.annotate(
+            is_favorited=Exists(Favorite.objects.filter(
+                user=user, recipe=OuterRef('pk'))),
+            is_in_shopping_cart=Exists(ShoppingCart.objects.filter(
+                user=user, recipe=OuterRef('pk'))),
+            author_is_subscribed=Exists(Subscription.objects.filter(
+                user=user, author=OuterRef('author'))))
+
+
+class Recipe(CounterMixin, models.Model):
     tags = models.ManyToManyField(
         Tag,
         verbose_name='тег',
@@ -138,6 +298,11 @@ class Recipe(models.Model):
     image = models.ImageField(
         'изображение',
         upload_to='recipe_images/')
+    image_renditions = models.JSONField(
+        'уменьшенные изображения',
+        default=dict,
+        blank=True,
+        editable=False)
     text = models.TextField(
         'рецепт')
     cooking_time = models.PositiveIntegerField(
@@ -147,15 +312,55 @@ class Recipe(models.Model):
         'дата публикации',
         auto_now_add=True,
     )
+    updated = models.DateTimeField(
+        'дата изменения',
+        auto_now=True)
+    tags_mask = models.BigIntegerField(
+        'маска тегов',
+        default=0,
+        editable=False)
+    favorites_count = models.PositiveIntegerField(
+        'в избранных',
+        default=0,
+        editable=False)
+    shoppingcarts_count = models.PositiveIntegerField(
+        'в корзинах',
+        default=0,
+        editable=False)
+
+    objects = RecipeQuerySet.as_manager()
+    counter_fields = ('favorites_count', 'shoppingcarts_count')
 
     class Meta:
         verbose_name = 'рецепт'
         verbose_name_plural = 'рецепты'
-        ordering = ('-pub_date',)
+        ordering = ('-pub_date', '-id',)
+        indexes = [
+            models.Index(
+                fields=('-pub_date', '-id',),
+                name='recipe_pub_date_id',
+            ),
+            models.Index(
+                fields=('-favorites_count', '-pub_date', '-id',),
+                name='recipe_popular',
+            )]
 
     def __str__(self):
         return self.name
 
+    def get_image_url(self, rendition):
+        if rendition in self.image_renditions:
+            return self.image.storage.url(self.image_renditions[rendition])
+        if self.image:
+            return self.image.url
+
+    def update_tags_mask(self):
+        self.tags_mask = Tag.get_mask(self.tags.all())
+        self.updated = timezone.now()
+        Recipe.objects.filter(pk=self.pk).update(
+            tags_mask=self.tags_mask, updated=self.updated)
+        ReferenceVersion.bump(Recipe)
+
 
 class RecipeIngredient(models.Model):
     recipe = models.ForeignKey(
@@ -232,3 +437,110 @@ class ShoppingCart(UserRecipe):
     class Meta(UserRecipe.Meta):
         verbose_name = 'корзина'
         verbose_name_plural = 'корзина'
+
+
+class ShoppingListItem(models.Model):
+    user = models.ForeignKey(
+        FoodUser,
+        verbose_name='пользователь',
+        related_name='shopping_list',
+        on_delete=models.CASCADE)
+    ingredient = models.ForeignKey(
+        Ingredient,
+        verbose_name='продукт',
+        related_name='shopping_list',
+        on_delete=models.CASCADE)
+    amount = models.PositiveIntegerField('мера')
+
+    class Meta:
+        verbose_name = 'продукт в списке покупок'
+        verbose_name_plural = 'список покупок'
+        constraints = [
+            models.UniqueConstraint(
+                fields=('user', 'ingredient',),
+                name='unique_shopping_list_item',
+            )]
+
+    def __str__(self):
+        return f'{self.user}: {self.ingredient} - {self.amount}'
+
+    @staticmethod
+    def get_recipe_amounts(recipe_id):
+        amounts = Counter()
+        for ingredient_id, amount in RecipeIngredient.objects.filter(
+                recipe_id=recipe_id).values_list('ingredient_id', 'amount'):
+            amounts[ingredient_id] += amount
+        return amounts
+
+    @staticmethod
+    def change_amounts(user_ids, amounts):
+        get_document_cache().delete(*user_ids)
+        amounts = {
+            ingredient_id: amount
+            for ingredient_id, amount in amounts.items() if amount}
+        if not user_ids or not amounts:
+            return
+        with transaction.atomic():
+            items = {
+                (item.user_id, item.ingredient_id): item
+                for item in ShoppingListItem.objects.select_for_update(
+                ).filter(user_id__in=user_ids, ingredient_id__in=amounts)}
+            new_items, changed_items, empty_ids = [], [], []
+            for user_id in user_ids:
+                for ingredient_id, amount in amounts.items():
+                    item = items.get((user_id, ingredient_id))
+                    if item is None:
+                        if amount > 0:
+                            new_items.append(ShoppingListItem(
+                                user_id=user_id,
+                                ingredient_id=ingredient_id,
+                                amount=amount))
+                        continue
+                    item.amount += amount
+                    if item.amount > 0:
+                        changed_items.append(item)
+                    else:
+                        empty_ids.append(item.id)
+            ShoppingListItem.objects.bulk_create(new_items)
+            ShoppingListItem.objects.bulk_update(changed_items, ('amount',))
+            ShoppingListItem.objects.filter(id__in=empty_ids).delete()
+
+    @staticmethod
+    def add_recipe(user_id, recipe_id):
+        ShoppingListItem.change_amounts(
+            (user_id,), ShoppingListItem.get_recipe_amounts(recipe_id))
+
+    @staticmethod
+    def remove_recipe(user_id, recipe_id):
+        ShoppingListItem.change_amounts(
+            (user_id,),
+            {ingredient_id: -amount for ingredient_id, amount
+             in ShoppingListItem.get_recipe_amounts(recipe_id).items()})
+
+    @staticmethod
+    def change_recipe(recipe_id, amounts):
+        ShoppingListItem.change_amounts(
+            tuple(ShoppingCart.objects.filter(
+                recipe_id=recipe_id).values_list('user_id', flat=True)),
+            amounts)
+
+    @staticmethod
+    def get_shopping_cart_ingredients(user):
+        return ShoppingListItem.objects.filter(
+            user=user
+        ).values(
+            'amount',
+            name=F('ingredient__name'),
+            unit=F('ingredient__measurement_unit'),
+        ).order_by('ingredient__name')
+
+    @staticmethod
+    def get_live_amounts():
+        return {
+            (item['user_id'], item['ingredient_id']): item['total']
+            for item in RecipeIngredient.objects.filter(
+                recipe__shoppingcarts__isnull=False
+            ).values(
+                'ingredient_id',
+                user_id=F('recipe__shoppingcarts__user'),
+            ).annotate(total=Sum('amount')).order_by()}
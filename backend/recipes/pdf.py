@@ -0,0 +1,47 @@
+from functools import lru_cache
+
+from reportlab.lib.pagesizes import A4
+from reportlab.lib.utils import simpleSplit
+from reportlab.pdfbase import pdfmetrics
+from reportlab.pdfbase.ttfonts import TTFont
+from reportlab.pdfgen import canvas
+
+from foodgram_project.settings import BIG_FONT, FONTS_ROOT, SMALL_FONT
+
+COLUMN_0 = 70
+LINE_0 = 750
+LINE_BOTTOM = 50
+NEXT_LINE = 20
+LINE_WIDTH = A4[0] - 2 * COLUMN_0
+
+
+@lru_cache(maxsize=None)
+def get_fonts():
+    for name in (BIG_FONT, SMALL_FONT):
+        pdfmetrics.registerFont(TTFont(name, FONTS_ROOT / f'{name}.ttf'))
+    return {
+        BIG_FONT: pdfmetrics.getFont(BIG_FONT),
+        SMALL_FONT: pdfmetrics.getFont(SMALL_FONT)}
+
+
+@lru_cache(maxsize=4096)
+def split_line(text, font, size):
+    if pdfmetrics.stringWidth(text, font, size) <= LINE_WIDTH:
+        return (text,)
+    return tuple(simpleSplit(text, font, size, LINE_WIDTH))
+
+
+def draw_pdf(file, lines):
+    get_fonts()
+    doc = canvas.Canvas(file, pagesize=A4)
+    y = LINE_0
+    for font, size, text in lines:
+        for line in split_line(text, font, size):
+            if y < LINE_BOTTOM:
+                doc.showPage()
+                y = LINE_0
+            doc.setFont(font, size)
+            doc.drawString(COLUMN_0, y, line)
+            y -= NEXT_LINE
+    doc.showPage()
+    doc.save()
@@ -0,0 +1,108 @@
+import threading
+from array import array
+from bisect import bisect_left
+from collections import defaultdict
+from functools import lru_cache
+
+from django.db import connection
+from django.db.models import Case, Q, Value, When
+
+from .models import Ingredient, ReferenceVersion
+
+TRIGRAM_SEARCH_VENDORS = ('postgresql',)
+GRAM_SIZES = (2, 3)
+
+
+def get_grams(name, size):
+    return {name[index:index + size] for index in range(len(name) - size + 1)}
+
+
+class DatabaseIngredientSearch:
+
+    def search(self, queryset, query, limit):
+        from django.contrib.postgres.search import TrigramSimilarity
+        return queryset.annotate(
+            search_rank=Case(
+                When(name__istartswith=query, then=Value(0)),
+                When(name__icontains=query, then=Value(1)),
+                default=Value(2)),
+            similarity=TrigramSimilarity('name', query),
+        ).filter(
+            Q(name__icontains=query) | Q(name__trigram_similar=query)
+        ).order_by('search_rank', '-similarity', 'name')[:limit]
+
+
+class PrefixIngredientSearch:
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.state = None
+        self.index = ((), (), {})
+
+    def get_state(self):
+        return ReferenceVersion.get_for_model(Ingredient).version
+
+    def build(self, state):
+        with self.lock:
+            if self.state == state:
+                return
+            ingredients = sorted(
+                (name.casefold(), ingredient_id)
+                for ingredient_id, name
+                in Ingredient.objects.values_list('id', 'name').iterator())
+            names = [name for name, _ in ingredients]
+            # Positions of the names containing each 2- and 3-character
+            # gram, substring matches scan one posting instead of all names.
+            grams = defaultdict(lambda: array('I'))
+            for position, name in enumerate(names):
+                for size in GRAM_SIZES:
+                    for gram in get_grams(name, size):
+                        grams[gram].append(position)
+            self.index = (
+                names,
+                [ingredient_id for _, ingredient_id in ingredients],
+                dict(grams))
+            self.state = state
+
+    def find(self, query, limit):
+        names, ids, grams = self.index
+        query = query.casefold()
+        start = bisect_left(names, query)
+        end = start
+        while (
+            end < len(names) and end - start < limit
+            and names[end].startswith(query)
+        ):
+            end += 1
+        found = ids[start:end]
+        size = min(len(query), GRAM_SIZES[-1])
+        if size < GRAM_SIZES[0]:
+            return found
+        postings = [
+            grams.get(gram, ()) for gram in get_grams(query, size)]
+        for position in min(postings, key=len):
+            if len(found) >= limit:
+                break
+            name = names[position]
+            if query in name and not name.startswith(query):
+                found.append(ids[position])
+        return found
+
+    def search(self, queryset, query, limit):
+        state = self.get_state()
+        if self.state != state:
+            self.build(state)
+        found = self.find(query, limit)
+        if not found:
+            return queryset.none()
+        return queryset.filter(id__in=found).order_by(Case(
+            *(When(id=ingredient_id, then=Value(position))
+              for position, ingredient_id in enumerate(found)),
+            default=Value(len(found))))
+
+
+@lru_cache(maxsize=None)
+def get_ingredient_search():
+    if connection.vendor in TRIGRAM_SEARCH_VENDORS:
+        return DatabaseIngredientSearch()
+    return PrefixIngredientSearch()
@@ -0,0 +1,144 @@
+from collections import Counter
+
+from django.db.models import F
+from django.db.models.signals import (m2m_changed, post_delete, post_save,
+                                      pre_delete, pre_save)
+from django.dispatch import receiver
+from django.utils import timezone
+
+from .models import (Favorite, FoodUser, Ingredient, Recipe,
+                     RecipeIngredient, ReferenceVersion, ShoppingCart,
+                     ShoppingListItem, Subscription, Tag)
+
+AUTHOR_FIELDS = {'email', 'username', 'first_name', 'last_name'}
+COUNTERS = (
+    (Recipe, FoodUser, 'author_id', 'recipes_count'),
+    (Favorite, Recipe, 'recipe_id', 'favorites_count'),
+    (ShoppingCart, Recipe, 'recipe_id', 'shoppingcarts_count'),
+    (Subscription, FoodUser, 'user_id', 'follower_count'),
+    (Subscription, FoodUser, 'author_id', 'following_count'),
+)
+
+
+@receiver((post_save, post_delete), sender=Tag)
+@receiver((post_save, post_delete), sender=Ingredient)
+def bump_reference_version(sender, **kwargs):
+    ReferenceVersion.bump(sender)
+
+
+@receiver(m2m_changed, sender=Recipe.tags.through)
+def update_tags_mask(sender, instance, action, reverse, pk_set, **kwargs):
+    if action not in ('post_add', 'post_remove', 'post_clear'):
+        return
+    if not reverse:
+        instance.update_tags_mask()
+        return
+    if action == 'post_clear':
+        recipes = Recipe.objects.with_any_tag((instance,))
+    else:
+        recipes = Recipe.objects.filter(pk__in=pk_set)
+    if action == 'post_add':
+        recipes.update(
+            tags_mask=F('tags_mask').bitor(1 << instance.bit),
+            updated=timezone.now())
+    else:
+        recipes.update(
+            tags_mask=F('tags_mask').bitand(~(1 << instance.bit)),
+            updated=timezone.now())
+    ReferenceVersion.bump(Recipe)
+
+
+@receiver(post_delete, sender=Tag)
+def clear_tag_bit(sender, instance, **kwargs):
+    Recipe.objects.with_any_tag((instance,)).update(
+        tags_mask=F('tags_mask').bitand(~(1 << instance.bit)))
+
+
+@receiver((post_save, post_delete), sender=Recipe)
+def bump_recipe_version(sender, **kwargs):
+    ReferenceVersion.bump(Recipe)
+
+
+@receiver((post_save, pre_delete), sender=Tag)
+def touch_tag_recipes(sender, instance, **kwargs):
+    Recipe.objects.filter(tags=instance).touch()
+
+
+@receiver((post_save, pre_delete), sender=Ingredient)
+def touch_ingredient_recipes(sender, instance, **kwargs):
+    Recipe.objects.filter(ingredients=instance).touch()
+
+
+@receiver(post_save, sender=FoodUser)
+def touch_author_recipes(sender, instance, created, update_fields, **kwargs):
+    if created or (
+            update_fields is not None
+            and not AUTHOR_FIELDS.intersection(update_fields)):
+        return
+    Recipe.objects.filter(author=instance).touch()
+
+
+def change_counters(sender, instance, delta):
+    for model, target, field, counter in COUNTERS:
+        if model is sender:
+            target.objects.filter(
+                pk=getattr(instance, field)).change_counter(counter, delta)
+
+
+# Fixtures (raw saves) already carry the dumped counter values.
+@receiver(post_save, sender=Recipe)
+@receiver(post_save, sender=Favorite)
+@receiver(post_save, sender=ShoppingCart)
+@receiver(post_save, sender=Subscription)
+def increment_counters(sender, instance, created, raw, **kwargs):
+    if created and not raw:
+        change_counters(sender, instance, 1)
+
+
+@receiver(post_delete, sender=Recipe)
+@receiver(post_delete, sender=Favorite)
+@receiver(post_delete, sender=ShoppingCart)
+@receiver(post_delete, sender=Subscription)
+def decrement_counters(sender, instance, **kwargs):
+    change_counters(sender, instance, -1)
+
+
+# Shopping list rows follow every write path (API, admin, cascades).
+# post_delete keeps them right whichever of ShoppingCart and
+# RecipeIngredient a recipe delete cascades to first.
+@receiver(post_save, sender=ShoppingCart)
+def add_shopping_list_recipe(sender, instance, created, **kwargs):
+    if created:
+        ShoppingListItem.add_recipe(instance.user_id, instance.recipe_id)
+
+
+@receiver(post_delete, sender=ShoppingCart)
+def remove_shopping_list_recipe(sender, instance, **kwargs):
+    ShoppingListItem.remove_recipe(instance.user_id, instance.recipe_id)
+
+
+@receiver(pre_save, sender=RecipeIngredient)
+def remember_recipe_ingredient(sender, instance, **kwargs):
+    instance.saved_values = None
+    if instance.pk is not None:
+        instance.saved_values = RecipeIngredient.objects.filter(
+            pk=instance.pk
+        ).values_list('recipe_id', 'ingredient_id', 'amount').first()
+
+
+@receiver(post_save, sender=RecipeIngredient)
+def change_shopping_list_ingredient(sender, instance, **kwargs):
+    amounts = Counter({instance.ingredient_id: instance.amount})
+    if getattr(instance, 'saved_values', None) is not None:
+        recipe_id, ingredient_id, amount = instance.saved_values
+        if recipe_id == instance.recipe_id:
+            amounts[ingredient_id] -= amount
+        else:
+            ShoppingListItem.change_recipe(recipe_id, {ingredient_id: -amount})
+    ShoppingListItem.change_recipe(instance.recipe_id, amounts)
+
+
+@receiver(post_delete, sender=RecipeIngredient)
+def remove_shopping_list_ingredient(sender, instance, **kwargs):
+    ShoppingListItem.change_recipe(
+        instance.recipe_id, {instance.ingredient_id: -instance.amount})
@@ -1,59 +1,103 @@
-import io
-from datetime import datetime
+import csv
+import json
+from collections import namedtuple
+from tempfile import SpooledTemporaryFile
 
-from reportlab.pdfgen import canvas
-
-from foodgram_project.settings import (BIG_FONT, BIG_FONT_SIZE, FILEFORMAT,
-                                       SMALL_FONT, SMALL_FONT_SIZE)
+from foodgram_project.settings import (BIG_FONT, BIG_FONT_SIZE, SMALL_FONT,
+                                       SMALL_FONT_SIZE)
 
 START = 0
-COLUMN_0 = 70
-LINE_0 = 750
-LINE_1 = 730
-LINE_2 = 710
-LINE_3 = 690
 TEXT_0 = 'Список продуктов:'
 TEXT_2 = 'Рецепты:'
-NEXT_LINE = 20
-
-
-def make_doc(ingredients, recipes):
-    date = str(datetime.today().date())
-    recipes_list = (set(recipe['name'] for recipe in recipes))
-    if FILEFORMAT == 'text/plain':
-        return (
-            '\n'.join((
-                TEXT_0,
-                date,
-                TEXT_2,
-                '\n'.join(recipes_list) + '\n',
-                '\n'.join(
-                    f'{index + 1}. {item["name"]} '
-                    f'({item["unit"]}) - {item["amount"]}'
-                    for index, item in enumerate(ingredients)))),
-            date)
-    if FILEFORMAT == 'application/pdf':
-        buffer = io.BytesIO()
-        doc = canvas.Canvas(buffer)
-        doc.setFont(BIG_FONT, BIG_FONT_SIZE)
-        doc.drawString(COLUMN_0, LINE_0, TEXT_0)
-        doc.setFont(SMALL_FONT, SMALL_FONT_SIZE)
-        doc.drawString(COLUMN_0, LINE_1, date)
-        doc.drawString(COLUMN_0, LINE_2, TEXT_2)
-        y = LINE_3
-        for recipe in recipes_list:
-            doc.drawString(COLUMN_0, y, recipe)
-            y -= NEXT_LINE
-        y -= NEXT_LINE
-        numeration = 1
-        for item in ingredients:
-            doc.drawString(
-                COLUMN_0, y,
-                f'{numeration}. {item["name"]} '
-                f'({item["unit"]}) - {item["amount"]}',)
-            y -= NEXT_LINE
-            numeration += 1
-        doc.showPage()
-        doc.save()
+MAX_MEMORY_SIZE = 1024 * 1024
+CHUNK_SIZE = 64 * 1024
+CSV_HEADER = ('name', 'unit', 'amount')
+ENCODING = 'utf-8'
+
+DocumentRenderer = namedtuple(
+    'DocumentRenderer', ('format', 'media_type', 'render'))
+RENDERERS = {}
+
+
+def renderer(document_format, media_type):
+    def register(render):
+        RENDERERS[document_format] = DocumentRenderer(
+            document_format, media_type, render)
+        return render
+    return register
+
+
+def get_renderer(media_type):
+    for document_renderer in RENDERERS.values():
+        if document_renderer.media_type == media_type:
+            return document_renderer
+
+
+def format_ingredient(index, item):
+    return (
+        f'{index + 1}. {item["name"]} '
+        f'({item["unit"]}) - {item["amount"]}')
+
+
+def get_lines(ingredients, recipes_list, date):
+    yield BIG_FONT, BIG_FONT_SIZE, TEXT_0
+    yield SMALL_FONT, SMALL_FONT_SIZE, date
+    yield SMALL_FONT, SMALL_FONT_SIZE, TEXT_2
+    for recipe in recipes_list:
+        yield SMALL_FONT, SMALL_FONT_SIZE, recipe
+    yield SMALL_FONT, SMALL_FONT_SIZE, ''
+    for index, item in enumerate(ingredients):
+        yield SMALL_FONT, SMALL_FONT_SIZE, format_ingredient(index, item)
+
+
+@renderer('pdf', 'application/pdf')
+def render_pdf(ingredients, recipes_list, date):
+    from .pdf import draw_pdf
+
+    with SpooledTemporaryFile(max_size=MAX_MEMORY_SIZE) as buffer:
+        draw_pdf(buffer, get_lines(ingredients, recipes_list, date))
         buffer.seek(START)
-        return buffer, date
+        yield from iter(lambda: buffer.read(CHUNK_SIZE), b'')
+
+
+@renderer('txt', 'text/plain')
+def render_text(ingredients, recipes_list, date):
+    yield '\n'.join((TEXT_0, date, TEXT_2, *recipes_list, '', '')).encode(
+        ENCODING)
+    for index, item in enumerate(ingredients):
+        yield (format_ingredient(index, item) + '\n').encode(ENCODING)
+
+
+class Echo:
+
+    def write(self, value):
+        return value
+
+
+@renderer('csv', 'text/csv')
+def render_csv(ingredients, recipes_list, date):
+    writer = csv.writer(Echo())
+    yield writer.writerow(CSV_HEADER).encode(ENCODING)
+    for item in ingredients:
+        yield writer.writerow(
+            [item[column] for column in CSV_HEADER]).encode(ENCODING)
+
+
+@renderer('json', 'application/json')
+def render_json(ingredients, recipes_list, date):
+    yield (
+        f'{{"date": {json.dumps(date)}, '
+        f'"recipes": {json.dumps(recipes_list, ensure_ascii=False)}, '
+        '"ingredients": [').encode(ENCODING)
+    separator = ''
+    for item in ingredients:
+        yield (separator + json.dumps(
+            {column: item[column] for column in CSV_HEADER},
+            ensure_ascii=False)).encode(ENCODING)
+        separator = ', '
+    yield b']}'
+
+
+def make_doc(ingredients, recipes, date, document_format):
+    recipes_list = sorted(set(recipe['name'] for recipe in recipes))
+    return RENDERERS[document_format].render(ingredients, recipes_list, date)
@@ -0,0 +1,48 @@
+from recipes.models import (Favorite, FoodUser, Ingredient, Recipe,
+                            RecipeIngredient, ShoppingCart, Subscription, Tag)
+
+
+def create_user(name):
+    return FoodUser.objects.create_user(
+        email=f'{name}@example.com',
+        username=name,
+        first_name=name,
+        last_name=name,
+        password='password')
+
+
+def create_recipes(count, authors=3, tags=3, ingredients=10):
+    users = [create_user(f'author{index}') for index in range(authors)]
+    tags = [
+        Tag.objects.create(
+            name=f'tag{index}', color='#00ff00', slug=f'tag{index}')
+        for index in range(tags)]
+    ingredients = [
+        Ingredient.objects.create(
+            name=f'ingredient{index}', measurement_unit='г')
+        for index in range(ingredients)]
+    recipes = []
+    for index in range(count):
+        recipe = Recipe.objects.create(
+            author=users[index % len(users)],
+            name=f'recipe{index}',
+            image='recipe_images/test.png',
+            text='text',
+            cooking_time=index + 1)
+        recipe.tags.set(tags[:index % len(tags) + 1])
+        RecipeIngredient.objects.bulk_create(
+            RecipeIngredient(
+                recipe=recipe,
+                ingredient=ingredients[(index + shift) % len(ingredients)],
+                amount=shift + 1)
+            for shift in range(3))
+        recipes.append(recipe)
+    return users, tags, ingredients, recipes
+
+
+def add_user_relations(user, authors, recipes):
+    for recipe in recipes[::2]:
+        Favorite.objects.create(user=user, recipe=recipe)
+        ShoppingCart.objects.create(user=user, recipe=recipe)
+    for author in authors:
+        Subscription.objects.create(user=user, author=author)
@@ -0,0 +1,46 @@
+from unittest import skipUnless
+
+from django.db import connection
+from django.test import TestCase
+from recipes.models import Ingredient
+from recipes.search import DatabaseIngredientSearch, PrefixIngredientSearch
+
+NAMES = ('сахар', 'сахарная пудра', 'ванильный сахар', 'соль', 'масло')
+
+
+class IngredientSearchMixin:
+
+    @classmethod
+    def setUpTestData(cls):
+        for name in NAMES:
+            Ingredient.objects.create(name=name, measurement_unit='г')
+
+    def search(self, query, limit=50):
+        return list(self.engine.search(
+            Ingredient.objects.all(), query, limit
+        ).values_list('name', flat=True))
+
+    def test_prefix_matches_first(self):
+        self.assertEqual(
+            self.search('сах')[:3],
+            ['сахар', 'сахарная пудра', 'ванильный сахар'])
+
+    def test_substring_matches(self):
+        self.assertEqual(self.search('ильн')[:1], ['ванильный сахар'])
+
+    def test_limit(self):
+        self.assertEqual(len(self.search('сах', limit=2)), 2)
+
+
+class PrefixIngredientSearchTest(IngredientSearchMixin, TestCase):
+    engine = PrefixIngredientSearch()
+
+    def test_index_follows_changes(self):
+        Ingredient.objects.create(name='сахарин', measurement_unit='г')
+        self.assertIn('сахарин', self.search('хари'))
+
+
+@skipUnless(
+    connection.vendor == 'postgresql', 'Trigram search needs PostgreSQL')
+class DatabaseIngredientSearchTest(IngredientSearchMixin, TestCase):
+    engine = DatabaseIngredientSearch()
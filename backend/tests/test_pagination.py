@@ -0,0 +1,36 @@
+from django.test import TestCase
+from rest_framework.test import APIClient
+
+from .fixtures import create_recipes
+
+
+class RecipePaginationTest(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        create_recipes(110)
+
+    def setUp(self):
+        self.client = APIClient()
+
+    def get_results(self, params):
+        response = self.client.get('/api/recipes/', params)
+        self.assertEqual(response.status_code, 200)
+        return response.json()['results']
+
+    def test_limit_is_not_capped(self):
+        self.assertEqual(len(self.get_results({'limit': 105})), 105)
+
+    def test_cursor_page_size_is_capped(self):
+        self.assertEqual(
+            len(self.get_results({'cursor': '', 'limit': 105})), 100)
+
+    def test_cursor_rejects_other_orderings(self):
+        response = self.client.get(
+            '/api/recipes/', {'cursor': '', 'ordering': 'popular'})
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('cursor', response.json())
+
+    def test_ordering_without_cursor(self):
+        self.assertEqual(
+            len(self.get_results({'ordering': 'popular', 'limit': 10})), 10)
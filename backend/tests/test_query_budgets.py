@@ -0,0 +1,53 @@
+from unittest import mock
+
+from django.test import TransactionTestCase
+from foodgram_project.settings import QUERY_BUDGETS
+from recipes.cache import get_fragment_cache
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+
+from .fixtures import add_user_relations, create_recipes, create_user
+
+
+@mock.patch.multiple(
+    'api.middleware', PROFILING=True, QUERY_BUDGET_STRICT=True)
+class QueryBudgetTest(TransactionTestCase):
+    """
+    ProfilingMiddleware raises QueryBudgetExceeded over a budget. Not a
+    TestCase: its savepoints would add a query to every atomic view.
+    """
+
+    def setUp(self):
+        self.authors, _, _, self.recipes = create_recipes(30)
+        self.user = create_user('reader')
+        add_user_relations(self.user, self.authors[1:], self.recipes)
+        self.client = APIClient()
+        self.client.credentials(
+            HTTP_AUTHORIZATION=f'Token {Token.objects.create(user=self.user)}')
+        self.checked = set()
+
+    def request(self, endpoint, method, url, status=200):
+        get_fragment_cache.cache_clear()
+        response = getattr(self.client, method)(url)
+        self.assertEqual(response.status_code, status, url)
+        if response.streaming:
+            b''.join(response.streaming_content)
+        self.checked.add(endpoint)
+
+    def test_endpoints_within_budget(self):
+        recipe = self.recipes[1]
+        author = self.authors[0]
+        self.request('recipes-list', 'get', '/api/recipes/')
+        self.request('recipes-retrieve', 'get', f'/api/recipes/{recipe.id}/')
+        for action in ('favorite', 'shopping_cart'):
+            url = f'/api/recipes/{recipe.id}/{action}/'
+            self.request(f'recipes-{action}', 'post', url, 201)
+            self.request(f'recipes-{action}', 'delete', url, 204)
+        self.request(
+            'recipes-download_shopping_cart', 'get',
+            '/api/recipes/download_shopping_cart/?format=txt')
+        self.request('users-subscriptions', 'get', '/api/users/subscriptions/')
+        url = f'/api/users/{author.id}/subscribe/'
+        self.request('users-subscribe', 'post', url, 201)
+        self.request('users-subscribe', 'delete', url, 204)
+        self.assertEqual(self.checked, set(QUERY_BUDGETS))
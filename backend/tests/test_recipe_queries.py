@@ -0,0 +1,37 @@
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from recipes.cache import get_fragment_cache
+from rest_framework.test import APIClient
+
+from .fixtures import add_user_relations, create_recipes, create_user
+
+
+class RecipeListQueriesTest(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        authors, _, _, recipes = create_recipes(30)
+        cls.user = create_user('reader')
+        add_user_relations(cls.user, authors, recipes)
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def count_queries(self, limit):
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get('/api/recipes/', {'limit': limit})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.json()['results']), limit)
+        return len(context.captured_queries)
+
+    def test_queries_do_not_grow_with_page_size(self):
+        get_fragment_cache.cache_clear()
+        cold = self.count_queries(5)
+        get_fragment_cache.cache_clear()
+        self.assertEqual(self.count_queries(25), cold)
+
+    def test_cached_queries_do_not_grow_with_page_size(self):
+        self.count_queries(25)
+        self.assertEqual(self.count_queries(25), self.count_queries(5))
@@ -0,0 +1,14 @@
+from io import StringIO
+
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.test import SimpleTestCase
+
+
+class StartupImportTimeTest(SimpleTestCase):
+
+    def test_import_time_within_budget(self):
+        try:
+            call_command('check_import_time', stdout=StringIO())
+        except CommandError as error:
+            self.fail(error)